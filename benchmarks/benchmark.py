@@ -0,0 +1,378 @@
+#!/usr/bin/env python2
+
+# Benchmark and regression suite for the hot paths of the ciphers, attacks and steganography tools in this repo
+# https://github.com/TartarusLabs/Crypto-Tricks/benchmarks/
+# james.fell@alumni.york.ac.uk
+
+# Every benchmark runs in its own child process, so that its peak resident set size is its own and one benchmark cannot warm
+# up or pollute another. The child loads the script under test straight from its directory, runs the hot path once to warm
+# up and then in batches for at least the minimum time, and reports the operations per second of the fastest batch and the
+# peak RSS as JSON.
+#
+# Results are compared against the stored baselines in baselines.json. A benchmark fails if its throughput has dropped by more
+# than the threshold, either the one given on the command line, the one stored with that benchmark or the default stored at
+# the top of the file. Run with -u on a known good tree to store new baselines.
+
+import os
+import imp
+import sys
+import atexit
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import resource
+import subprocess
+
+# Top of the repo, with one directory per topic
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default baselines file, next to this script
+baselines_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Default allowed slowdown, as a fraction of the baseline throughput
+default_threshold = 0.5
+
+# Number of batches each benchmark is timed in
+batches = 5
+
+
+# Function to load a script from one of the topic directories as a module, whether or not its file name is a valid module name
+def load(directory, filename):
+	path = os.path.join(root, directory)
+	if path not in sys.path:
+		sys.path.insert(0, path)
+	name = filename[:-3].replace('-', '_')
+	return imp.load_source(name, os.path.join(path, filename))
+
+
+# Function to make a scratch directory holding copies of the given files from a topic directory, and change into it.
+# Several of the scripts read and write fixed file names in the current directory.
+def scratch(directory, filenames):
+	path = tempfile.mkdtemp(prefix='benchmark-')
+	atexit.register(shutil.rmtree, path, True)
+	for filename in filenames:
+		shutil.copy(os.path.join(root, directory, filename), path)
+	os.chdir(path)
+	return path
+
+
+###
+# The benchmarks. Each one sets up its inputs and returns (function to time, operations per call, name of one operation).
+
+def codebook():
+	spn = load('block-cipher-linear-cryptanalysis', 'spn.py')
+	return spn.codebook, 65536, 'blocks'
+
+
+def encrypt():
+	from bitstring import BitArray
+	block_cipher = load('block-cipher-linear-cryptanalysis', 'block-cipher.py')
+	plaintexts = [BitArray('uint:16=' + str(num)) for num in range(0, 65536, 257)]
+	return lambda: [block_cipher.encrypt(plaintext) for plaintext in plaintexts], len(plaintexts), 'blocks'
+
+
+def lat4():
+	spn = load('block-cipher-linear-cryptanalysis', 'spn.py')
+	sboxanalysis = load('block-cipher-linear-cryptanalysis', 'sboxanalysis.py')
+	return lambda: sboxanalysis.lat(spn.sbox), 1, 'tables'
+
+
+def lat8():
+	import numpy
+	sboxanalysis = load('block-cipher-linear-cryptanalysis', 'sboxanalysis.py')
+	sbox = [int(x) for x in numpy.random.RandomState(0).permutation(256)]
+	return lambda: sboxanalysis.lat(sbox), 1, 'tables'
+
+
+def partial_key():
+	spn = load('block-cipher-linear-cryptanalysis', 'spn.py')
+	linearattack = load('block-cipher-linear-cryptanalysis', 'linearattack.py')
+	plaintexts, ciphertexts = spn.codebook()
+	return lambda: linearattack.attack(plaintexts, ciphertexts, linearattack.mask([1]), linearattack.mask([2,6])), len(plaintexts), 'pairs'
+
+
+def lfsr():
+	from bitstring import BitArray
+	stream_cipher = load('stream-cipher-correlation-attack', 'stream-cipher.py')
+	return lambda: stream_cipher.register([14,15], BitArray('uint:15=3254'), 2000), 2000, 'bits'
+
+
+def lfsr_words():
+	from bitstring import BitArray
+	lfsr = load('stream-cipher-correlation-attack', 'lfsr.py')
+	return lambda: lfsr.register([14,15], BitArray('uint:15=3254'), 2000), 2000, 'bits'
+
+
+def keystream_chunks():
+	import itertools
+	stream_cipher = load('stream-cipher-correlation-attack', 'stream-cipher.py')
+	return lambda: list(itertools.islice(stream_cipher.keystream_chunks(stream_cipher.initial_states), 4)), 4 * stream_cipher.chunk_bytes, 'bytes'
+
+
+def berlekamp_massey():
+	complexity = load('stream-cipher-correlation-attack', 'complexity.py')
+	stream_cipher = load('stream-cipher-correlation-attack', 'stream-cipher.py')
+	chunk = next(stream_cipher.keystream_chunks(stream_cipher.initial_states, 8192))
+	return lambda: complexity.measure([chunk], 65536), 65536, 'bits'
+
+
+def statistical_tests():
+	randomness = load('stream-cipher-correlation-attack', 'randomness.py')
+	stream_cipher = load('stream-cipher-correlation-attack', 'stream-cipher.py')
+	packed = load('stream-cipher-correlation-attack', 'packed.py')
+	outputs = next(stream_cipher.register_chunks(stream_cipher.initial_states, randomness.block_bits // 8))
+	words = packed.combine(stream_cipher.boolean_outputs, outputs)
+	names = [register['name'] for register in stream_cipher.registers]
+	return lambda: randomness.Battery(randomness.default_lags, names).update(words, randomness.block_bits, outputs), randomness.block_bits, 'bits'
+
+
+def correlation_scan():
+	from bitstring import BitArray
+	siegenthaler = load('stream-cipher-correlation-attack', 'siegenthaler.py')
+	lfsr = load('stream-cipher-correlation-attack', 'lfsr.py')
+	with open(os.path.join(root, 'stream-cipher-correlation-attack', 'stream.txt'), 'r') as samples:
+		keystream = BitArray('bin=' + samples.read())
+
+	def scan():
+		for key in range(0, 16):
+			siegenthaler.agreement(keystream, lfsr.register([4,7], BitArray('uint:7=' + str(key)), 2000), 2000)
+	return scan, 16, 'initial states'
+
+
+def fwht_scan():
+	from bitstring import BitArray
+	correlation = load('stream-cipher-correlation-attack', 'correlation.py')
+	with open(os.path.join(root, 'stream-cipher-correlation-attack', 'stream.txt'), 'r') as samples:
+		keystream = BitArray('bin=' + samples.read())
+	return lambda: correlation.scan([14,15], 15, keystream, 2000), 32768, 'initial states'
+
+
+def packed_agreement():
+	import numpy
+	from bitstring import BitArray
+	lfsr = load('stream-cipher-correlation-attack', 'lfsr.py')
+	packed = load('stream-cipher-correlation-attack', 'packed.py')
+	with open(os.path.join(root, 'stream-cipher-correlation-attack', 'stream.txt'), 'r') as samples:
+		keystream = packed.pack(BitArray('bin=' + samples.read()), 2000)
+	candidates = lfsr.engine([3,8,9,11], 11).output(numpy.arange(0, 2048), 2000)
+	return lambda: packed.agreement(candidates, keystream, 2000), 2048, 'streams'
+
+
+def sequential_scan():
+	import numpy
+	from bitstring import BitArray
+	lfsr = load('stream-cipher-correlation-attack', 'lfsr.py')
+	packed = load('stream-cipher-correlation-attack', 'packed.py')
+	correlation = load('stream-cipher-correlation-attack', 'correlation.py')
+	with open(os.path.join(root, 'stream-cipher-correlation-attack', 'stream.txt'), 'r') as samples:
+		keystream = packed.pack(BitArray('bin=' + samples.read()), 2000)
+	candidates = lfsr.engine([8,11,12,13], 13).output(numpy.arange(1, 8192), 2000)
+	return lambda: correlation.sequential(candidates, keystream, 2000, 2/8.0), 8191, 'initial states'
+
+
+def combiners():
+	from bitstring import BitArray
+	combining_function = load('stream-cipher-correlation-attack', 'combining-function.py')
+	balanced = [combiner for combiner in range(0, 4096) if bin(combiner).count("1") == 8][0:32]
+	return lambda: [combining_function.approximation_table(BitArray('uint:16=' + str(combiner))) for combiner in balanced], len(balanced), 'combiners'
+
+
+def resilient_search():
+	resilient = load('stream-cipher-correlation-attack', 'resilient.py')
+	return lambda: resilient.find(5, 2, 0, workers=1), 1, 'searches'
+
+
+def embed():
+	stego = load('steganography', 'stego.py')
+	scratch('steganography', ['in.png', 'secret.txt'])
+	return lambda: stego.stego_embed('in.png', 'secret.txt', 'm0uNta1n123'), 1, 'embeds'
+
+
+def recover():
+	stego = load('steganography', 'stego.py')
+	scratch('steganography', ['in.png', 'secret.txt'])
+	stego.stego_embed('in.png', 'secret.txt', 'm0uNta1n123')
+	return lambda: stego.stego_recover('out.png', 'm0uNta1n123'), 1, 'recoveries'
+
+
+def mse_psnr():
+	stego = load('steganography', 'stego.py')
+	steganalyse = load('steganography', 'steganalyse.py')
+	scratch('steganography', ['in.png', 'secret.txt'])
+	stego.stego_embed('in.png', 'secret.txt', 'm0uNta1n123')
+	return lambda: steganalyse.getStats('in.png', 'out.png'), 1, 'comparisons'
+
+
+benchmarks = [
+	('codebook', codebook, 'Full codebook generation with the table-driven engine in spn.py'),
+	('encrypt', encrypt, 'BitArray encrypt() from block-cipher.py'),
+	('lat4', lat4, 'LAT of the 4 bit S-box with sboxanalysis.py'),
+	('lat8', lat8, 'LAT of a random 8 bit S-box with sboxanalysis.py'),
+	('partial-key', partial_key, 'Partial subkey counting pass and scoring over the full codebook with linearattack.py'),
+	('lfsr', lfsr, 'Clocking a 15 bit LFSR with register() from stream-cipher.py'),
+	('lfsr-words', lfsr_words, 'Clocking a 15 bit LFSR a word at a time with lfsr.py'),
+	('keystream-chunks', keystream_chunks, 'Streaming 4MB of keystream with the bitsliced combining function in stream-cipher.py'),
+	('berlekamp-massey', berlekamp_massey, 'Linear complexity profile of 64K bits of keystream with complexity.py'),
+	('statistical-tests', statistical_tests, 'Statistical test battery over a 1M bit block of keystream with randomness.py'),
+	('correlation-scan', correlation_scan, 'Correlation scan over LFSR1 initial states in siegenthaler.py'),
+	('fwht-scan', fwht_scan, 'Walsh-Hadamard scan over all LFSR4 initial states with correlation.py'),
+	('packed-agreement', packed_agreement, 'Packed popcount agreement of 2048 candidate streams with packed.py'),
+	('sequential-scan', sequential_scan, 'Sequential probability ratio test over LFSR3 initial states with correlation.py'),
+	('combiners', combiners, 'Combining function LAT in combining-function.py'),
+	('resilient-search', resilient_search, 'Search for order 2 correlation immune combining functions of 5 inputs with resilient.py'),
+	('embed', embed, 'LSB embedding with stego.py'),
+	('recover', recover, 'LSB recovery with stego.py'),
+	('mse-psnr', mse_psnr, 'MSE and PSNR of a stego image with steganalyse.py'),
+]
+###
+
+
+# Function run in the child process to time one benchmark. Returns a dictionary of results.
+def measure(name, min_time):
+	setup = dict((entry[0], entry[1]) for entry in benchmarks)[name]
+
+	# The scripts print as they go, which would get mixed up with the results, so send their output nowhere
+	stdout = sys.stdout
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		function, ops, unit = setup()
+		function()
+
+		# Time batches of calls and keep the fastest batch, as the slower ones mostly measure whatever else the machine was doing
+		calls = 0
+		best = None
+		startTime = time.time()
+		while time.time() - startTime < min_time or calls < batches:
+			batchTime = time.time()
+			batch = 0
+			while batch == 0 or time.time() - batchTime < min_time / batches:
+				function()
+				batch += 1
+			rate = ops * batch / (time.time() - batchTime)
+			if best is None or rate > best:
+				best = rate
+			calls += batch
+		elapsed = time.time() - startTime
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+
+	return {
+		'name': name,
+		'unit': unit,
+		'calls': calls,
+		'seconds': elapsed,
+		'ops_per_sec': best,
+		'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+	}
+
+
+# Function to run one benchmark in a child process and return its results, or a dictionary holding the error
+def run(name, min_time):
+	child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', name, '--min-time', str(min_time)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	out, err = child.communicate()
+	if child.returncode != 0:
+		return {'name': name, 'error': err.decode('utf-8', 'replace').strip().split('\n')[-1]}
+	return json.loads(out.decode('utf-8').strip().split('\n')[-1])
+
+
+# Function to compare results against the baselines, adding the slowdown and status to each result.
+# Returns True if every benchmark passed.
+def compare(results, baselines, threshold=None):
+	passed = True
+	for result in results:
+		baseline = baselines.get('benchmarks', {}).get(result['name'])
+		if 'error' in result:
+			result['status'] = 'error'
+		elif baseline is None:
+			result['status'] = 'new'
+		else:
+			allowed = threshold
+			if allowed is None:
+				allowed = baseline.get('threshold', baselines.get('threshold', default_threshold))
+			result['baseline_ops_per_sec'] = baseline['ops_per_sec']
+			result['baseline_peak_rss_kb'] = baseline['peak_rss_kb']
+			result['slowdown'] = 1 - result['ops_per_sec'] / baseline['ops_per_sec']
+			result['threshold'] = allowed
+			result['status'] = 'slow' if result['slowdown'] > allowed else 'ok'
+		if result['status'] in ('error', 'slow'):
+			passed = False
+	return passed
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark the hot paths of the scripts in this repo and check for performance regressions.')
+	parser.add_argument('-b','--benchmarks', help='Comma separated list of benchmarks to run. Default is all of them.', required=False)
+	parser.add_argument('-l','--list', help='List the benchmarks and exit.', action='store_true')
+	parser.add_argument('-t','--threshold', help='Allowed slowdown as a fraction of the baseline, eg 0.25. Default is the threshold stored in the baselines file.', type=float, required=False)
+	parser.add_argument('-m','--min-time', help='Minimum number of seconds to run each benchmark for. Default is 1.', type=float, default=1.0)
+	parser.add_argument('-f','--baselines', help='Baselines file. Default is baselines.json next to this script.', default=baselines_file)
+	parser.add_argument('-u','--update', help='Store the results as the new baselines instead of comparing against them.', action='store_true')
+	parser.add_argument('-o','--output', help='JSON file to write the results to.', required=False)
+	parser.add_argument('--child', help=argparse.SUPPRESS, required=False)
+	args = vars(parser.parse_args())
+
+	if args['child']:
+		print (json.dumps(measure(args['child'], args['min_time'])))
+		sys.exit(0)
+
+	if args['list']:
+		for name, setup, description in benchmarks:
+			print (name + " - " + description)
+		sys.exit(0)
+
+	names = [entry[0] for entry in benchmarks]
+	if args['benchmarks']:
+		selected = args['benchmarks'].split(',')
+		for name in selected:
+			if name not in names:
+				print ("Unknown benchmark " + name + ". Use -l to list them.")
+				sys.exit(1)
+		names = [name for name in names if name in selected]
+
+	baselines = {'threshold': default_threshold, 'benchmarks': {}}
+	if os.path.exists(args['baselines']):
+		with open(args['baselines'], 'r') as infile:
+			baselines = json.load(infile)
+
+	results = []
+	for name in names:
+		result = run(name, args['min_time'])
+		results.append(result)
+		if 'error' in result:
+			print (name + ": failed - " + result['error'])
+		else:
+			print (name + ": " + str("%.1f" % result['ops_per_sec']) + " " + result['unit'] + " per second, peak RSS " + str(result['peak_rss_kb']) + " KB")
+
+	if args['update']:
+		for result in results:
+			if 'error' not in result:
+				entry = baselines['benchmarks'].get(result['name'], {})
+				entry.update({'unit': result['unit'], 'ops_per_sec': result['ops_per_sec'], 'peak_rss_kb': result['peak_rss_kb']})
+				baselines['benchmarks'][result['name']] = entry
+		with open(args['baselines'], 'w') as outfile:
+			json.dump(baselines, outfile, indent=1, sort_keys=True, separators=(',', ': '))
+			outfile.write("\n")
+		print ("Baselines stored in " + args['baselines'])
+		passed = not [result for result in results if 'error' in result]
+	else:
+		passed = compare(results, baselines, args['threshold'])
+		for result in results:
+			if 'slowdown' in result and result['slowdown'] < 0:
+				print (result['name'] + ": " + str("%.1f" % (-100 * result['slowdown'])) + "% faster than baseline (" + result['status'] + ")")
+			elif 'slowdown' in result:
+				print (result['name'] + ": " + str("%.1f" % (100 * result['slowdown'])) + "% slower than baseline (" + result['status'] + ")")
+			elif result['status'] == 'new':
+				print (result['name'] + ": no baseline stored")
+
+	if args['output']:
+		with open(args['output'], 'w') as outfile:
+			json.dump({'python': sys.version.split()[0], 'passed': passed, 'results': results}, outfile, indent=1, sort_keys=True, separators=(',', ': '))
+			outfile.write("\n")
+
+	if not passed:
+		print ("Performance regression detected")
+		sys.exit(1)
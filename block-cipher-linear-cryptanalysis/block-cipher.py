@@ -5,7 +5,10 @@
 # james.fell@alumni.york.ac.uk
 
 
+import sys
 from bitstring import BitArray
+import spn
+import codebook
 
 ###
 # Configure subkeys and S-box
@@ -90,13 +93,21 @@ def encrypt(plaintext):
 
 
 
-# Generate all 2^16 possible 16 bit plaintext blocks along with their ciphertext to use as a target for our linear cyptanalysis attack
-print "Generating 65,536 plaintext/ciphertext pairs for linear cryptanalysis"
-samples = open('plaintext-ciphertext-out.txt', 'w')
-for num in range(0,65536):
-	plain = BitArray('uint:16='+str(num))
-	samples.write(str(plain.uint) + "  ")
-    	samples.write(str(encrypt(plain).uint)+"\n")
-samples.close()
-print "plaintext-ciphertext-out.txt created"
+# Main entry point. Generate the codebook and write it out.
+if __name__ == '__main__':
 
+	# Generate all 2^16 possible 16 bit plaintext blocks along with their ciphertext to use as a target for our linear cyptanalysis attack
+	# The table-driven engine in spn.py encrypts the whole codebook as one array, using the same subkeys and S-box configured above
+	print "Generating 65,536 plaintext/ciphertext pairs for linear cryptanalysis"
+	keys = [subkey1.uint, subkey2.uint, subkey3.uint, subkey4.uint, subkey5.uint]
+	plaintexts, ciphertexts = spn.codebook(keys)
+
+	# Spot check the fast engine against the BitArray implementation of encrypt() above
+	for num in range(0,65536,257):
+		if encrypt(BitArray('uint:16='+str(num))).uint != ciphertexts[num]:
+			print "Table-driven engine disagrees with encrypt() for plaintext " + str(num)
+			sys.exit(1)
+
+	# Write the codebook in the binary format from codebook.py. Use codebook.py -m export to get the old text format.
+	codebook.write('plaintext-ciphertext-out.bin', plaintexts, ciphertexts)
+	print "plaintext-ciphertext-out.bin created"
@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+
+# Binary codebook format for plaintext/ciphertext pairs, opened with a zero-copy memory map
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# File layout (all little endian):
+#   16 byte header  - magic 'SPNC', uint16 format version, uint16 block size in bits, uint32 number of pairs, 4 bytes padding
+#   plaintexts      - number of pairs x uint16
+#   ciphertexts     - number of pairs x uint16
+
+import sys
+import struct
+import argparse
+import numpy
+
+magic = b'SPNC'
+version = 1
+header_format = '<4sHHI4x'
+header_size = struct.calcsize(header_format)
+
+
+# Function to write plaintext and ciphertext arrays to a binary codebook file
+def write(filename, plaintexts, ciphertexts):
+	columns = numpy.vstack((plaintexts, ciphertexts)).astype('<u2')
+	with open(filename, 'wb') as f:
+		f.write(struct.pack(header_format, magic, version, 16, columns.shape[1]))
+		columns.tofile(f)
+
+
+# Function to read the header of a binary codebook file and return the number of pairs it holds
+def read_header(filename):
+	with open(filename, 'rb') as f:
+		header = f.read(header_size)
+	if len(header) != header_size:
+		raise ValueError(filename + " is too short to be a codebook file")
+	file_magic, file_version, block_bits, count = struct.unpack(header_format, header)
+	if file_magic != magic or file_version != version or block_bits != 16:
+		raise ValueError(filename + " is not a version " + str(version) + " 16 bit codebook file")
+	return count
+
+
+# Function to memory map a binary codebook file and return read-only (plaintexts, ciphertexts) arrays backed by the file
+def open_codebook(filename):
+	count = read_header(filename)
+	columns = numpy.memmap(filename, dtype='<u2', mode='r', offset=header_size, shape=(2, count))
+	return columns[0], columns[1]
+
+
+# Function to read a codebook in the original text format, one "plaintext  ciphertext" pair of decimal integers per line
+def import_text(filename):
+	columns = numpy.loadtxt(filename, dtype=numpy.uint16, ndmin=2)
+	return columns[:,0], columns[:,1]
+
+
+# Function to write a codebook in the original text format
+def export_text(filename, plaintexts, ciphertexts):
+	numpy.savetxt(filename, numpy.column_stack((plaintexts, ciphertexts)), fmt='%d', delimiter='  ')
+
+
+# Function to open a binary codebook, creating it from the text version first if it does not exist yet
+def open_or_import(filename, text_filename):
+	try:
+		return open_codebook(filename)
+	except IOError:
+		plaintexts, ciphertexts = import_text(text_filename)
+		write(filename, plaintexts, ciphertexts)
+		return open_codebook(filename)
+
+
+# Main entry point. Convert between the text and binary codebook formats.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Convert plaintext/ciphertext codebooks between the text and binary formats.')
+	parser.add_argument('-m','--mode', help='Set mode to import (text to binary) or export (binary to text)', required=True)
+	parser.add_argument('-i','--input', help='File to read.', required=True)
+	parser.add_argument('-o','--output', help='File to write.', required=True)
+	args = vars(parser.parse_args())
+
+	if args['mode'] == 'import':
+		plaintexts, ciphertexts = import_text(args['input'])
+		write(args['output'], plaintexts, ciphertexts)
+	elif args['mode'] == 'export':
+		plaintexts, ciphertexts = open_codebook(args['input'])
+		export_text(args['output'], plaintexts, ciphertexts)
+	else:
+		print ("Mode must be import or export")
+		sys.exit(1)
+	print ("Converted " + str(len(plaintexts)) + " plaintext/ciphertext pairs from " + args['input'] + " to " + args['output'])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python2
+
+# Differential cryptanalysis attack against our block cipher implementation in block-cipher.py
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+
+import time
+import codebook
+import differential
+import sboxanalysis
+
+# Hardcoded S box as per the specification
+sbox_encrypt = [4,0,12,3,8,11,10,9,13,14,2,7,6,5,15,1]
+
+# Calculate the Difference Distribution Table
+# Each entry is the number of the 16 possible inputs x for which S(x) XOR S(x XOR input difference) is the output difference
+counter = sboxanalysis.ddt(sbox_encrypt)
+
+# For every combination of input difference and output difference
+for s_in_diff in range(0,16):
+	for s_out_diff in range(0,16):
+
+		# Print out the table
+		print "Input Difference: " + str(s_in_diff) + "  Output Difference: " + str(s_out_diff) + "  Count: " + str(counter[s_in_diff][s_out_diff])
+
+
+# Memory map our target 64k plaintext/ciphertext pairs from the binary codebook, importing it from the text file on first run
+# As every possible plaintext is in the codebook, any chosen plaintext pair can simply be looked up
+plaintexts, ciphertexts = codebook.open_or_import('plaintext-ciphertext.bin', 'plaintext-ciphertext.txt')
+
+print "Initiating differential cryptanalysis attack...."
+
+# The two characteristics below were found with ./trailsearch.py -d and between them cover all four S-boxes of the last round
+
+# First we attack the third and fourth 4 bit blocks of subkey5
+# dP = 0000 0000 0011 0000 -> dU4 = 0000 0000 0010 0010 with probability 1/32
+startTime = time.time()
+first, second = differential.codebook_pairs(plaintexts, ciphertexts, 0x0030)
+counter, right = differential.attack(first, second, 0x0022)
+endTime = time.time()
+
+# Whichever 8 bit guess for partial subkey5 gave the highest count is the correct one. Expected count is approx 32768/32 = 1024.
+for subkey5_bits in range(0,256):
+	print "Partial Subkey: " + str(subkey5_bits) + " Count: " + str(counter[subkey5_bits]) + " Probability: " + str(counter[subkey5_bits] / float(len(first)))
+print "Partial Subkey " + str(counter.argmax()) + " is the best candidate key!"
+print "Pairs processed: " + str(len(first)) + " (" + str(right) + " passed the filter) at " + str(int(len(first) / max(endTime - startTime, 1e-9))) + " pairs per second"
+
+# This identified 8 bits of subkey5. The partial subkey is XXXX XXXX 1101 0101.
+# Note the last 4 bits. The linear attack could not separate 0101 from 1101 (and 0111, 1001) for them, but here 0101 stands out.
+
+
+# Next we attack the first and second 4 bit blocks of subkey5
+# dP = 0000 0001 0000 0001 -> dU4 = 1000 1000 0000 0000 with probability 1/64
+startTime = time.time()
+first, second = differential.codebook_pairs(plaintexts, ciphertexts, 0x0101)
+counter, right = differential.attack(first, second, 0x8800)
+endTime = time.time()
+
+# Whichever 8 bit guess for partial subkey5 gave the highest count is the correct one. Expected count is approx 32768/64 = 512.
+for subkey5_bits in range(0,256):
+	print "Partial Subkey: " + str(subkey5_bits) + " Count: " + str(counter[subkey5_bits]) + " Probability: " + str(counter[subkey5_bits] / float(len(first)))
+print "Partial Subkey " + str(counter.argmax()) + " is the best candidate key!"
+print "Pairs processed: " + str(len(first)) + " (" + str(right) + " passed the filter) at " + str(int(len(first) / max(endTime - startTime, 1e-9))) + " pairs per second"
+
+# This identified the other 8 bits of subkey5. The entire subkey5 is 1101 1101 1101 0101 = 56789.
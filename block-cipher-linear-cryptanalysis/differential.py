@@ -0,0 +1,75 @@
+#!/usr/bin/env python2
+
+# Differential cryptanalysis of the block cipher in block-cipher.py: chosen plaintext pairs and last round partial subkey counting
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# The attack follows the Heys tutorial. For a characteristic dP -> dU4 over the first three rounds we take many plaintext pairs
+# with difference dP, guess the last round subkey bits feeding the S-boxes that are active in dU4, partially decrypt both
+# ciphertexts and count how often the difference at U4 matches dU4. The correct guess gives the highest count.
+#
+# All pairs are processed together with NumPy. Each active S-box is handled separately, giving a 16 x pairs table of hits for
+# every guess of its 4 subkey bits, and the tables are then combined, so there is no loop over individual pairs. Nibbles are
+# numbered 0 to 3 from the left, as in linearattack.py.
+
+import numpy
+import spn
+import linearattack
+
+# Function to pick out every pair of plaintexts with the given difference from a codebook, each pair once, and return the two
+# arrays of ciphertexts. Only pairs where both plaintexts are present in the codebook are used.
+def codebook_pairs(plaintexts, ciphertexts, input_difference):
+	plaintexts = numpy.asarray(plaintexts, dtype=numpy.uint16)
+	present = numpy.zeros(65536, dtype=bool)
+	present[plaintexts] = True
+	by_plaintext = numpy.zeros(65536, dtype=numpy.uint16)
+	by_plaintext[plaintexts] = ciphertexts
+
+	partners = plaintexts ^ numpy.uint16(input_difference)
+	first = plaintexts[present[partners] & (plaintexts < partners)]
+	return by_plaintext[first], by_plaintext[first ^ numpy.uint16(input_difference)]
+
+
+# Function to generate count random chosen plaintext pairs with the given difference by encrypting them under keys, for when no
+# codebook is available. Returns the two arrays of ciphertexts.
+def chosen_pairs(input_difference, count, keys=spn.subkeys, seed=None):
+	first = numpy.random.RandomState(seed).randint(0, 65536, count).astype(numpy.uint16)
+	return spn.encrypt_batch(first, keys), spn.encrypt_batch(first ^ numpy.uint16(input_difference), keys)
+
+
+# Function to count, for every guess of the last round subkey nibbles that are active in output_difference, how many of the
+# ciphertext pairs partially decrypt to that difference at U4. Returns (counts, pairs) where counts is indexed by the guessed
+# nibbles concatenated from left to right and pairs is the number of pairs that passed the filter.
+def attack(first, second, output_difference):
+	first = numpy.asarray(first, dtype=numpy.uint16)
+	second = numpy.asarray(second, dtype=numpy.uint16)
+	nibbles = linearattack.mask_nibbles(output_difference)
+
+	# S-boxes with no input difference have no output difference either, so a right pair must have a zero ciphertext
+	# difference in every other nibble. Throw away the pairs that do not.
+	inactive_mask = 0xffff
+	for n in nibbles:
+		inactive_mask &= ~(0xf000 >> (4 * n))
+	keep = ((first ^ second) & numpy.uint16(inactive_mask)) == 0
+	first = first[keep]
+	second = second[keep]
+
+	# For each active S-box build a 16 x pairs table saying whether each guess of its subkey nibble gives the right difference
+	guesses = numpy.arange(16, dtype=numpy.uint8).reshape(-1, 1)
+	hits = []
+	for n in nibbles:
+		shift = 12 - 4 * n
+		first_nibble = ((first >> shift) & 15).astype(numpy.uint8).reshape(1, -1)
+		second_nibble = ((second >> shift) & 15).astype(numpy.uint8).reshape(1, -1)
+		difference = linearattack.sbox_decrypt[first_nibble ^ guesses] ^ linearattack.sbox_decrypt[second_nibble ^ guesses]
+		hits.append(difference == ((output_difference >> shift) & 15))
+
+	# Combine the tables. A pair counts for a guess only if every nibble of the guess gives the right difference.
+	combined = hits[0]
+	for table in hits[1:-1]:
+		combined = (combined[:,None,:] & table[None,:,:]).reshape(-1, len(first))
+	if len(hits) == 1:
+		counts = combined.sum(axis=1)
+	else:
+		counts = numpy.dot(combined.astype(numpy.int64), hits[-1].astype(numpy.int64).T).ravel()
+	return counts, len(first)
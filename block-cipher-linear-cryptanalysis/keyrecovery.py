@@ -0,0 +1,186 @@
+#!/usr/bin/env python2
+
+# Recovery of all five subkeys of the block cipher in block-cipher.py from one codebook, peeling off one round at a time
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# linear-cryptanalysis.py stops once it has subkey5. Here the attack keeps going. Once the last round key of an R round cipher is
+# known, the whole codebook is partially decrypted through that round in one batched call. Undoing the S-boxes gives the inputs
+# to the last round, and undoing the permutation as well gives V ^ P^-1(k), where V is the S-box output of round R-1 and k its
+# round key. The codebook is then that of an R-1 round cipher of exactly the same shape, whose last key is P^-1(k), so the same
+# linear attack runs again with R-2 round trails from trailsearch.py. This repeats until a single round S(P ^ k1) ^ k2' is
+# left, which is solved directly a nibble at a time.
+#
+# Every partially decrypted array is kept, so each stage starts from the previous one rather than decrypting from scratch, and a
+# later run can resume from any stage. The peeling uses the decryption layer tables of spn.py.
+
+import os
+import sys
+import time
+import argparse
+import numpy
+import spn
+import codebook
+import linearattack
+import trailsearch
+
+# The two groups of nibbles attacked together at each stage, as in parallelattack.py
+nibble_groups = [[0, 1], [2, 3]]
+
+
+# Function to score every candidate value of some last round subkey nibbles using every trail whose active S-boxes lie within them.
+# Each trail scores a candidate by its deviation from N/2 divided by the deviation expected for the correct key, |bias| x N.
+# Returns an array indexed by the target nibbles concatenated from left to right.
+def rank_nibbles(plaintexts, ciphertexts, trails, target_nibbles):
+	pairs = len(plaintexts)
+	candidates = numpy.arange(16 ** len(target_nibbles))
+	scores = numpy.zeros(len(candidates))
+	for trail in trails:
+		if not set(trail['boxes']) <= set(target_nibbles):
+			continue
+		plaintext_mask, u_mask = trail['masks'][0], trail['masks'][-1]
+		nibbles = linearattack.mask_nibbles(u_mask)
+
+		# Project each candidate onto the nibbles this trail involves
+		guesses = numpy.zeros(len(candidates), dtype=numpy.int64)
+		for n in nibbles:
+			guesses = (guesses << 4) | ((candidates >> (4 * (len(target_nibbles) - 1 - target_nibbles.index(n)))) & 15)
+
+		counts = linearattack.count_table(plaintexts, ciphertexts, plaintext_mask, nibbles)
+		holds = linearattack.score_guesses(counts, nibbles, u_mask)
+		scores += numpy.abs(holds[guesses] - pairs / 2.0) / (abs(trail['bias']) * pairs)
+	return scores
+
+
+# Function to rank candidates for the last round key of a codebook for a cipher of the given number of rounds (at least 2) with
+# the linear attack. The best few values of each group of nibbles are combined, and the full keys are returned best first.
+def last_round_keys(plaintexts, ciphertexts, rounds, candidates=4):
+	trails = trailsearch.search(rounds - 1, max_active=2)
+	ranked = [(0.0, 0)]
+	for group in nibble_groups:
+		scores = rank_nibbles(plaintexts, ciphertexts, trails, group)
+		options = []
+		for best in numpy.argsort(-scores, kind='mergesort')[0:candidates]:
+			part = 0
+			for j, n in enumerate(group):
+				part |= ((int(best) >> (4 * (len(group) - 1 - j))) & 15) << (12 - 4 * n)
+			options.append((scores[best], part))
+		ranked = [(score + more, key | part) for score, key in ranked for more, part in options]
+	ranked.sort(key=lambda option: -option[0])
+	return [key for score, key in ranked]
+
+
+# Function to recover both keys of a single round codebook, C = S(P ^ k1) ^ k2. For each nibble the right guess of k1 is the one
+# that makes C ^ S(P ^ k1) the same for every pair, and that value is the nibble of k2. Returns (k1, k2) or None.
+def single_round_keys(plaintexts, ciphertexts):
+	plaintexts = numpy.asarray(plaintexts, dtype=numpy.uint16)
+	ciphertexts = numpy.asarray(ciphertexts, dtype=numpy.uint16)
+	sbox_encrypt = numpy.array(spn.sbox, dtype=numpy.uint16)
+	first_key = 0
+	last_key = 0
+	for n in range(0, 4):
+		shift = 12 - 4 * n
+		p = (plaintexts >> shift) & 15
+		c = (ciphertexts >> shift) & 15
+		for guess in range(0, 16):
+			values = c ^ sbox_encrypt[p ^ guess]
+			if (values == values[0]).all():
+				first_key |= guess << shift
+				last_key |= int(values[0]) << shift
+				break
+		else:
+			return None
+	return first_key, last_key
+
+
+# Function to partially decrypt a codebook through its last round, given that round's key and the decryption layer to use
+def peel(ciphertexts, key, layer, cipher=spn.cipher):
+	return cipher.run_batch(ciphertexts, [layer], [key, 0])
+
+
+# Function to recover every subkey of the 4 round cipher from a codebook.
+# Returns (subkeys, stages) where stages is the list of ciphertext arrays attacked at each stage, the original codebook first,
+# each one partially decrypted from the one before it. known is a list of subkeys already recovered, last round first, and
+# cached a matching list of stages from an earlier run, so that the pipeline resumes where it left off.
+# A wrong key at one stage leaves nothing consistent for the single round at the end, so if that happens the search backs up
+# and tries the next best last round key, up to candidates values for each group of nibbles. The 3 round trails used against
+# the last round are the weakest, so the right key is occasionally not ranked first there. Later stages use much more biased
+# shorter trails and only their best key is tried.
+def recover(plaintexts, ciphertexts, known=[], cached=None, cipher=spn.cipher, candidates=16, verbose=False):
+	rounds = cipher.rounds
+	known = [spn.permute(k, cipher.pbox_inverse) if 0 < i < rounds else k for i, k in enumerate(known)]
+	if not cached:
+		cached = [ciphertexts]
+
+	# Depth first search over the stages. keys holds the round keys found so far, adjusted for the peeled permutations.
+	# Returns the full list of adjusted keys and the stages that led to them, or None.
+	def descend(stages, keys):
+		stage = len(keys)
+		if stage == rounds - 1:
+			solved = single_round_keys(plaintexts, stages[stage])
+			if solved is None:
+				return None
+			return keys + [solved[1], solved[0]], stages
+
+		if stage < len(known):
+			options = [known[stage]]
+		else:
+			startTime = time.time()
+			options = last_round_keys(plaintexts, stages[stage], rounds - stage, candidates if stage == len(known) else 1)
+			if verbose:
+				print ("Round " + str(rounds - stage) + " key candidates ranked in " + str(time.time() - startTime) + " seconds")
+
+		for key in options:
+
+			# Reuse the partially decrypted array from the cache when it was made with a known key
+			if stage < len(known) and stage + 1 < len(cached):
+				peeled = cached[stage + 1]
+			else:
+				peeled = peel(stages[stage], key, cipher.decrypt_tables_np[stage], cipher)
+			result = descend(stages + [peeled], keys + [key])
+			if result is not None:
+				return result
+			if verbose and len(options) > 1:
+				print ("Round " + str(rounds - stage) + " key " + str(key) + " is inconsistent with the codebook, trying the next candidate")
+		return None
+
+	result = descend(cached[0:1], [])
+	if result is None:
+		raise ValueError("No combination of candidate keys fits the codebook")
+	keys, stages = result
+
+	# Undo the adjustment of the round keys made by the permutations that were peeled off
+	subkeys = [keys[rounds]] + [spn.permute(keys[stage], cipher.pbox) for stage in range(rounds - 1, 0, -1)] + [keys[0]]
+	return subkeys, stages
+
+
+# Main entry point. Recover all five subkeys from a codebook and check them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Recover all five subkeys of the block cipher in block-cipher.py from a codebook.')
+	parser.add_argument('-i','--input', help='Binary codebook file to attack. Default is plaintext-ciphertext.bin.', default='plaintext-ciphertext.bin')
+	args = vars(parser.parse_args())
+
+	# Memory map the codebook, importing it from the text file of the same name on first run
+	try:
+		plaintexts, ciphertexts = codebook.open_or_import(args['input'], os.path.splitext(args['input'])[0] + '.txt')
+	except IOError as e:
+		print ("Could not open the codebook: " + str(e))
+		sys.exit(1)
+
+	startTime = time.time()
+	try:
+		subkeys, stages = recover(plaintexts, ciphertexts, verbose=True)
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+	endTime = time.time()
+
+	for i in range(0, len(subkeys)):
+		print ("Subkey" + str(i + 1) + ": " + "{0:b}".format(subkeys[i]).zfill(16) + " = " + str(subkeys[i]))
+	print ("Time taken (seconds): " + str(endTime - startTime))
+
+	if (spn.encrypt_batch(plaintexts, subkeys) == ciphertexts).all():
+		print ("The subkeys reproduce every pair in the codebook")
+	else:
+		print ("The subkeys do not reproduce the codebook")
+		sys.exit(1)
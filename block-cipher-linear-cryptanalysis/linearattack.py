@@ -0,0 +1,87 @@
+#!/usr/bin/env python2
+
+# Counting-first partial subkey recovery for the linear cryptanalysis attack in linear-cryptanalysis.py
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# Rather than walking the whole codebook once per subkey guess, we make a single pass over the data and count how often each
+# (plaintext parity, relevant ciphertext nibbles) combination occurs. Every subkey guess is then scored from that small table,
+# so the cost is O(N + guesses x table size) instead of O(N x guesses).
+#
+# Bits are numbered as in the Heys tutorial, from 1 (leftmost, most significant) to 16 (rightmost). Nibble 0 is the leftmost
+# 4 bits of the block and nibble 3 the rightmost.
+
+import numpy
+import spn
+
+# The inverse S-box, used to take the last round back from V4 to U4
+sbox_decrypt = numpy.array([spn.sbox.index(x) for x in range(0,16)], dtype=numpy.uint8)
+
+# Parity of every 4 bit value
+nibble_parity = numpy.array([bin(x).count("1") & 1 for x in range(0,16)], dtype=numpy.uint8)
+
+
+# Function to turn a list of bit numbers such as [6,7,8] into a 16 bit integer mask
+def mask(bits):
+	result = 0
+	for bit in bits:
+		result |= 0x8000 >> (bit - 1)
+	return result
+
+
+# Function to return the list of nibbles that a 16 bit mask touches
+def mask_nibbles(bit_mask):
+	return [n for n in range(0,4) if bit_mask & (0xf000 >> (4 * n))]
+
+
+# Function to XOR together the bits of every value in a NumPy array that are marked by a mask
+def parity(values, bit_mask):
+	x = numpy.asarray(values, dtype=numpy.uint16) & numpy.uint16(bit_mask)
+	x = x ^ (x >> 8)
+	x = x ^ (x >> 4)
+	return nibble_parity[x & 15]
+
+
+# Function to make the single pass over the codebook.
+# Returns a 2 x 16^k table where entry [p][c] counts the pairs whose plaintext parity is p and whose ciphertext nibbles listed in
+# nibbles, concatenated from left to right, are equal to c.
+def count_table(plaintexts, ciphertexts, plaintext_mask, nibbles):
+	ciphertexts = numpy.asarray(ciphertexts, dtype=numpy.uint16)
+	index = parity(plaintexts, plaintext_mask).astype(numpy.intp)
+	for n in nibbles:
+		index = (index << 4) | ((ciphertexts >> (12 - 4 * n)) & 15)
+	return numpy.bincount(index, minlength=2 * 16 ** len(nibbles)).reshape(2, 16 ** len(nibbles))
+
+
+# Function to score every guess for the unknown last round subkey nibbles from the table built by count_table().
+# known_key maps nibbles whose subkey value has already been recovered to that value; every other nibble touched by u_mask is guessed.
+# Returns an array indexed by the guessed nibbles concatenated from left to right, holding the number of pairs for which
+# the approximation (plaintext bits) + (U4 bits) = 0 holds under that guess. If guesses is given only those guesses are scored,
+# in that order.
+def score_guesses(counts, nibbles, u_mask, known_key={}, guesses=None):
+	guessed = [n for n in nibbles if n not in known_key]
+	if guesses is None:
+		guesses = numpy.arange(16 ** len(guessed))
+	guesses = numpy.asarray(guesses).reshape(-1, 1)
+	entries = numpy.arange(16 ** len(nibbles)).reshape(1, -1)
+
+	# For each guess and each table entry, work out the parity of the U4 bits in the approximation
+	u_parity = numpy.zeros((guesses.shape[0], entries.shape[1]), dtype=numpy.uint8)
+	for j, n in enumerate(nibbles):
+		ciphertext_nibble = ((entries >> (4 * (len(nibbles) - 1 - j))) & 15).astype(numpy.uint8)
+		if n in known_key:
+			key_nibble = numpy.uint8(known_key[n])
+		else:
+			key_nibble = ((guesses >> (4 * (len(guessed) - 1 - guessed.index(n)))) & 15).astype(numpy.uint8)
+		u4 = sbox_decrypt[ciphertext_nibble ^ key_nibble]
+		u_parity ^= nibble_parity[u4 & ((u_mask >> (12 - 4 * n)) & 15)]
+
+	# The approximation holds whenever the plaintext parity equals the U4 parity
+	return numpy.dot(1 - u_parity, counts[0]) + numpy.dot(u_parity, counts[1])
+
+
+# Function to run one partial subkey attack for the approximation (bits of plaintext_mask) + (bits of u_mask) = 0
+def attack(plaintexts, ciphertexts, plaintext_mask, u_mask, known_key={}):
+	nibbles = mask_nibbles(u_mask)
+	counts = count_table(plaintexts, ciphertexts, plaintext_mask, nibbles)
+	return score_guesses(counts, nibbles, u_mask, known_key)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python2
+
+# ECB and CTR modes of operation for streaming files of any size through the block cipher in spn.py
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# Files are processed in fixed size chunks, so memory use stays constant however large the file is. Each chunk is turned into
+# a NumPy array of big endian blocks and pushed through the batched table lookups of spn.py in one call.
+#
+# ECB pads the plaintext to a whole number of blocks with 1 to (block size) bytes, each holding the number of padding bytes.
+# CTR needs no padding. It starts from a random counter value that is written in front of the ciphertext. Bear in mind that
+# with the 16 bit toy cipher the counter, and hence the keystream, repeats every 65,536 blocks (128KB).
+
+import os
+import sys
+import time
+import argparse
+import numpy
+import spn
+
+# Default number of bytes to process at a time
+chunk_size = 1 << 20
+
+
+# Function to return the big endian NumPy type of one block of a cipher
+def block_type(cipher):
+	return numpy.dtype('>u' + str(cipher.width // 8))
+
+
+# Function to read up to size bytes from a file, only returning fewer at the end of the file
+def read_chunk(infile, size):
+	chunk = infile.read(size)
+	while len(chunk) < size:
+		more = infile.read(size - len(chunk))
+		if not more:
+			break
+		chunk += more
+	return chunk
+
+
+# Function to encrypt a file in ECB mode. Returns the number of plaintext bytes processed.
+def ecb_encrypt_file(cipher, key, infile, outfile, size=chunk_size):
+	dtype = block_type(cipher)
+	size -= size % dtype.itemsize
+	total = 0
+	while True:
+		chunk = read_chunk(infile, size)
+		total += len(chunk)
+		last = len(chunk) < size
+
+		# Pad the final chunk, which may be empty, to a whole number of blocks
+		if last:
+			padding = dtype.itemsize - len(chunk) % dtype.itemsize
+			chunk += bytes(bytearray([padding] * padding))
+
+		blocks = numpy.frombuffer(chunk, dtype=dtype)
+		outfile.write(cipher.encrypt_batch(blocks, key).astype(dtype).tobytes())
+		if last:
+			return total
+
+
+# Function to decrypt a file in ECB mode. Returns the number of plaintext bytes recovered.
+def ecb_decrypt_file(cipher, key, infile, outfile, size=chunk_size):
+	dtype = block_type(cipher)
+	size -= size % dtype.itemsize
+	total = 0
+
+	# Read one chunk ahead, as the padding has to be stripped from the final chunk
+	chunk = read_chunk(infile, size)
+	while True:
+		next_chunk = read_chunk(infile, size)
+		if len(chunk) == 0 or len(chunk) % dtype.itemsize:
+			raise ValueError("Ciphertext is not a whole number of " + str(dtype.itemsize) + " byte blocks")
+
+		blocks = numpy.frombuffer(chunk, dtype=dtype)
+		plain = cipher.decrypt_batch(blocks, key).astype(dtype).tobytes()
+		if not next_chunk:
+			padding = bytearray(plain[-1:])[0]
+			if padding < 1 or padding > dtype.itemsize or bytearray(plain[-padding:]) != bytearray([padding] * padding):
+				raise ValueError("Bad padding, the key is probably wrong")
+			outfile.write(plain[:-padding])
+			return total + len(plain) - padding
+
+		outfile.write(plain)
+		total += len(plain)
+		chunk = next_chunk
+
+
+# Function to XOR a file with the CTR keystream starting at the given counter value. Encryption and decryption are the same
+# operation. Returns the number of bytes processed.
+def ctr_file(cipher, key, counter, infile, outfile, size=chunk_size):
+	dtype = block_type(cipher)
+	size -= size % dtype.itemsize
+	total = 0
+	while True:
+		chunk = read_chunk(infile, size)
+		if not chunk:
+			return total
+
+		# Encrypt the run of counter values covering this chunk, wrapping round at the block size
+		blocks = (len(chunk) + dtype.itemsize - 1) // dtype.itemsize
+		counters = (numpy.arange(blocks, dtype=numpy.uint64) + numpy.uint64(counter)).astype(cipher.dtype)
+		keystream = numpy.frombuffer(cipher.encrypt_batch(counters, key).astype(dtype).tobytes(), dtype=numpy.uint8)
+
+		data = numpy.frombuffer(chunk, dtype=numpy.uint8)
+		outfile.write((data ^ keystream[:len(data)]).tobytes())
+		counter = (counter + blocks) % (1 << cipher.width)
+		total += len(chunk)
+
+
+# Function to encrypt a file in CTR mode, writing a random initial counter in front of the ciphertext
+def ctr_encrypt_file(cipher, key, infile, outfile, size=chunk_size):
+	dtype = block_type(cipher)
+	header = os.urandom(dtype.itemsize)
+	outfile.write(header)
+	counter = int(numpy.frombuffer(header, dtype=dtype)[0])
+	return ctr_file(cipher, key, counter, infile, outfile, size)
+
+
+# Function to decrypt a file in CTR mode, reading the initial counter from in front of the ciphertext
+def ctr_decrypt_file(cipher, key, infile, outfile, size=chunk_size):
+	dtype = block_type(cipher)
+	header = read_chunk(infile, dtype.itemsize)
+	if len(header) != dtype.itemsize:
+		raise ValueError("Ciphertext is too short to hold the initial counter")
+	counter = int(numpy.frombuffer(header, dtype=dtype)[0])
+	return ctr_file(cipher, key, counter, infile, outfile, size)
+
+
+modes = {
+	('encrypt', 'ecb'): ecb_encrypt_file,
+	('decrypt', 'ecb'): ecb_decrypt_file,
+	('encrypt', 'ctr'): ctr_encrypt_file,
+	('decrypt', 'ctr'): ctr_decrypt_file,
+}
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Encrypt or decrypt files with the block cipher from block-cipher.py in ECB or CTR mode.')
+	parser.add_argument('-m','--mode', help='Set mode to encrypt or decrypt', required=True)
+	parser.add_argument('-b','--block-mode', help='Set mode of operation to ecb or ctr. Default is ctr.', default='ctr')
+	parser.add_argument('-k','--key', help='The 5 subkeys, comma separated. Default is the subkeys configured in block-cipher.py.', required=False)
+	parser.add_argument('-i','--input', help='File to read.', required=True)
+	parser.add_argument('-o','--output', help='File to write.', required=True)
+	args = vars(parser.parse_args())
+
+	if (args['mode'], args['block_mode']) not in modes:
+		print ("Mode must be encrypt or decrypt and block mode must be ecb or ctr")
+		sys.exit(1)
+
+	key = spn.subkeys
+	if args['key']:
+		key = [int(subkey, 0) for subkey in args['key'].split(',')]
+
+	# Make a note of start time for calculating throughput
+	startTime = time.time()
+
+	with open(args['input'], 'rb') as infile:
+		with open(args['output'], 'wb') as outfile:
+			try:
+				processed = modes[(args['mode'], args['block_mode'])](spn.cipher, key, infile, outfile)
+			except ValueError as e:
+				print (str(e))
+				sys.exit(1)
+
+	endTime = time.time()
+
+	# Display some stats for the user
+	print ("Data processed (bytes): " + str(processed))
+	print ("Time taken (seconds): " + str(endTime - startTime))
+	print ("Throughput (MB per second): " + str(processed / 1000000.0 / max(endTime - startTime, 1e-9)))
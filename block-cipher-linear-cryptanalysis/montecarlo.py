@@ -0,0 +1,118 @@
+#!/usr/bin/env python2
+
+# Monte Carlo experiments measuring how many known plaintexts the linear attack needs
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# The thresholds in linear-cryptanalysis.py were picked by eye for one key and all 65,536 pairs. Here every trial draws a random
+# set of five subkeys and N distinct random plaintexts, encrypts them with the batch engine in spn.py, runs the partial subkey
+# attack from linearattack.py and records the rank of the correct partial subkey among all the guesses, ordered by deviation
+# from N/2. Ties are counted against the correct key, so a rank of 1 means it was strictly the best.
+#
+# For an attack guessing m key bits the advantage of a trial is m - log2(rank), as defined by Selcuk, so the advantage is m bits
+# when the correct key comes first and 0 when it comes last. For each N the runner reports the success probability (rank 1),
+# the mean advantage and the probability of reaching each whole number of bits of advantage, as CSV.
+
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy
+import spn
+import linearattack
+import trailsearch
+
+# Default sample sizes to try
+sample_sizes = [250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 65536]
+
+
+# Function to run one trial. Returns (N, rank of the correct partial subkey).
+def trial(args):
+	N, seed, plaintext_mask, u_mask = args
+	random = numpy.random.RandomState(seed)
+	keys = [int(k) for k in random.randint(0, 65536, 5)]
+	plaintexts = random.permutation(65536)[0:N].astype(numpy.uint16)
+	ciphertexts = spn.encrypt_batch(plaintexts, keys)
+
+	counter = linearattack.attack(plaintexts, ciphertexts, plaintext_mask, u_mask)
+	correct = 0
+	for n in linearattack.mask_nibbles(u_mask):
+		correct = (correct << 4) | ((keys[4] >> (12 - 4 * n)) & 15)
+	deviations = numpy.abs(counter - N / 2.0)
+	return N, int((deviations >= deviations[correct]).sum())
+
+
+# Function to run trials for every sample size across a pool of worker processes.
+# Returns a dictionary mapping each N to the list of ranks of the correct key.
+def run(trail, sizes=sample_sizes, trials=200, workers=None, seed=0):
+	jobs = []
+	for i, N in enumerate(sizes):
+		for t in range(0, trials):
+			jobs.append((N, seed * 1000003 + i * trials + t, trail['masks'][0], trail['masks'][-1]))
+
+	ranks = dict((N, []) for N in sizes)
+	if workers == 1:
+		results = map(trial, jobs)
+	else:
+		pool = multiprocessing.Pool(workers)
+		results = pool.imap_unordered(trial, jobs, chunksize=16)
+	for N, rank in results:
+		ranks[N].append(rank)
+	if workers != 1:
+		pool.close()
+		pool.join()
+	return ranks
+
+
+# Function to turn the ranks for each N into CSV lines of success probability and advantage
+def summarise(ranks, key_bits):
+	lines = ["N,trials,success_probability,mean_advantage," + ",".join("p_advantage_" + str(a) for a in range(1, key_bits + 1))]
+	for N in sorted(ranks):
+		rank = numpy.array(ranks[N], dtype=float)
+		advantage = key_bits - numpy.log2(rank)
+		fields = [N, len(rank), (rank == 1).mean(), advantage.mean()]
+		fields += [(advantage >= a).mean() for a in range(1, key_bits + 1)]
+		lines.append(",".join(str(field) for field in fields))
+	return lines
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Measure the success probability and advantage of the linear attack against the number of known plaintexts.')
+	parser.add_argument('-r','--rounds', help='Number of rounds the approximation covers. Default is 3, for attacking the 4 round cipher.', type=int, default=3)
+	parser.add_argument('-a','--approximation', help='Which trail from trailsearch.py to use, 0 being the most biased. Default is 0.', type=int, default=0)
+	parser.add_argument('-n','--samples', help='Comma separated list of sample sizes N. Default is ' + ",".join(str(N) for N in sample_sizes) + '.', required=False)
+	parser.add_argument('-t','--trials', help='Number of random keys to try for each N. Default is 200.', type=int, default=200)
+	parser.add_argument('-w','--workers', help='Number of worker processes. Default is one per core.', type=int, required=False)
+	parser.add_argument('-s','--seed', help='Seed for the random keys and plaintexts. Default is 0.', type=int, default=0)
+	parser.add_argument('-o','--output', help='CSV file to write. Default is to print the CSV.', required=False)
+	args = vars(parser.parse_args())
+
+	sizes = sample_sizes
+	if args['samples']:
+		sizes = [int(N) for N in args['samples'].split(',')]
+	if [N for N in sizes if N < 1 or N > 65536]:
+		print ("Sample sizes must be between 1 and 65536")
+		sys.exit(1)
+
+	trails = trailsearch.search(args['rounds'])
+	if args['approximation'] < 0 or args['approximation'] >= len(trails):
+		print ("Approximation must be between 0 and " + str(len(trails) - 1))
+		sys.exit(1)
+	trail = trails[args['approximation']]
+	key_bits = 4 * len(linearattack.mask_nibbles(trail['masks'][-1]))
+	print ("Using approximation " + trailsearch.describe(trail) + " guessing " + str(key_bits) + " key bits")
+
+	# Make a note of start time for calculating throughput
+	startTime = time.time()
+	ranks = run(trail, sizes, args['trials'], args['workers'], args['seed'])
+	endTime = time.time()
+	print ("Trials run: " + str(len(sizes) * args['trials']) + " in " + str(endTime - startTime) + " seconds")
+
+	lines = summarise(ranks, key_bits)
+	if args['output']:
+		with open(args['output'], 'w') as outfile:
+			outfile.write("\n".join(lines) + "\n")
+	else:
+		for line in lines:
+			print (line)
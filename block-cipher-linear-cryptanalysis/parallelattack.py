@@ -0,0 +1,143 @@
+#!/usr/bin/env python2
+
+# Multi-core partial subkey recovery, sharding the candidate subkeys across a pool of worker processes
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# Every worker memory maps the same binary codebook file (see codebook.py), so the plaintext/ciphertext pairs are shared through
+# the page cache rather than pickled and copied into each process. Each worker makes its single counting pass per approximation
+# once (see linearattack.py), then scores whichever shards of the candidate space it is handed. Scores are streamed back shard by
+# shard and merged by the driver into one ranked list.
+#
+# Several approximations can be used at once. A candidate covers all the target nibbles, and each approximation scores it on the
+# nibbles it involves. The score of an approximation is its deviation from N/2 divided by the deviation expected for the correct
+# key, |bias| x N, so the correct candidate should score about 1 per approximation and wrong ones less.
+
+import os
+import sys
+import argparse
+import multiprocessing
+import numpy
+import codebook
+import linearattack
+import trailsearch
+
+# State set up once in each worker process by init_worker()
+worker = {}
+
+# Most target nibbles the command line accepts. Each extra nibble multiplies the candidates to score by 16, so all four would mean
+# scoring 65,536 candidates against every approximation, which takes minutes rather than seconds.
+max_nibbles = 3
+
+
+# Function to check that every approximation only involves target or already recovered nibbles, and to work out for each one
+# which target nibbles it guesses
+def plan(approximations, target_nibbles, known_key):
+	planned = []
+	for approximation in approximations:
+		plaintext_mask, u_mask = approximation['masks'][0], approximation['masks'][-1]
+		nibbles = linearattack.mask_nibbles(u_mask)
+		for n in nibbles:
+			if n not in target_nibbles and n not in known_key:
+				raise ValueError("Approximation " + trailsearch.describe(approximation) + " involves nibble " + str(n) + " which is neither a target nor known")
+		guessed = [n for n in nibbles if n not in known_key]
+		planned.append((plaintext_mask, u_mask, abs(approximation['bias']), nibbles, guessed))
+	return planned
+
+
+# Function run once in each worker process to map the codebook and make the counting pass for every approximation
+def init_worker(codebook_file, planned, target_nibbles, known_key):
+	plaintexts, ciphertexts = codebook.open_codebook(codebook_file)
+	worker['pairs'] = len(plaintexts)
+	worker['target_nibbles'] = target_nibbles
+	worker['known_key'] = known_key
+	worker['approximations'] = []
+	for plaintext_mask, u_mask, bias, nibbles, guessed in planned:
+		counts = linearattack.count_table(plaintexts, ciphertexts, plaintext_mask, nibbles)
+		worker['approximations'].append((counts, u_mask, bias, nibbles, guessed))
+
+
+# Function to score the candidates in range(start, end) against every approximation. Returns (start, scores).
+def score_shard(shard):
+	start, end = shard
+	target_nibbles = worker['target_nibbles']
+	candidates = numpy.arange(start, end)
+	scores = numpy.zeros(end - start)
+	for counts, u_mask, bias, nibbles, guessed in worker['approximations']:
+
+		# Project each candidate onto the nibbles this approximation guesses
+		guesses = numpy.zeros(end - start, dtype=numpy.int64)
+		for n in guessed:
+			guesses = (guesses << 4) | ((candidates >> (4 * (len(target_nibbles) - 1 - target_nibbles.index(n)))) & 15)
+
+		# Approximations over fewer nibbles than the candidates see each guess many times, so only score each one once
+		unique_guesses, positions = numpy.unique(guesses, return_inverse=True)
+		holds = linearattack.score_guesses(counts, nibbles, u_mask, worker['known_key'], unique_guesses)
+		scores += (numpy.abs(holds - worker['pairs'] / 2.0) / (bias * worker['pairs']))[positions]
+	return start, scores
+
+
+# Function to rank every candidate value of the target nibbles of the last round subkey.
+# approximations is a list of trails as returned by trailsearch.search(), or any dictionaries with 'masks' and 'bias' entries.
+# Returns a list of (candidate, score) pairs, best first. A candidate is the target nibbles concatenated from left to right.
+# Raises IOError if the codebook file cannot be opened.
+def rank_candidates(codebook_file, approximations, target_nibbles, known_key={}, workers=None, shard_size=256):
+	target_nibbles = sorted(target_nibbles)
+	planned = plan(approximations, target_nibbles, known_key)
+
+	# Open the codebook here first, as a worker that fails to open it is just replaced by the pool and the attack never ends
+	codebook.open_codebook(codebook_file)
+	total = 16 ** len(target_nibbles)
+	shards = [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+	scores = numpy.zeros(total)
+
+	if workers == 1:
+		init_worker(codebook_file, planned, target_nibbles, known_key)
+		results = map(score_shard, shards)
+	else:
+		pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(codebook_file, planned, target_nibbles, known_key))
+		results = pool.imap_unordered(score_shard, shards)
+
+	for start, shard_scores in results:
+		scores[start:start + len(shard_scores)] = shard_scores
+
+	if workers != 1:
+		pool.close()
+		pool.join()
+
+	order = numpy.argsort(-scores, kind='mergesort')
+	return [(int(candidate), float(scores[candidate])) for candidate in order]
+
+
+# Main entry point. Rank candidates for some nibbles of subkey5 using every trail the search finds over those nibbles.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Rank candidate last round subkey nibbles on all cores using the best linear trails.')
+	parser.add_argument('-i','--input', help='Binary codebook file to attack. Default is plaintext-ciphertext.bin.', default='plaintext-ciphertext.bin')
+	parser.add_argument('-n','--nibbles', help='Comma separated list of up to ' + str(max_nibbles) + ' subkey nibbles to recover, numbered 0 to 3 from the left. Each nibble multiplies the work by 16. Default is 0,1.', default='0,1')
+	parser.add_argument('-w','--workers', help='Number of worker processes. Default is one per core.', type=int, required=False)
+	parser.add_argument('-c','--candidates', help='Number of top ranked candidates to print. Default is 10.', type=int, default=10)
+	args = vars(parser.parse_args())
+
+	target_nibbles = sorted(int(n) for n in args['nibbles'].split(','))
+	if not target_nibbles or [n for n in target_nibbles if n < 0 or n > 3]:
+		print ("Nibbles must be between 0 and 3")
+		sys.exit(1)
+	if len(set(target_nibbles)) > max_nibbles:
+		print ("At most " + str(max_nibbles) + " nibbles can be ranked at once, as all four means scoring 65,536 candidates against every approximation. Use keyrecovery.py to recover the whole subkey.")
+		sys.exit(1)
+
+	# Memory map the codebook, importing it from the text file of the same name on first run, so the workers can open it too
+	try:
+		codebook.open_or_import(args['input'], os.path.splitext(args['input'])[0] + '.txt')
+	except IOError as e:
+		print ("Could not open the codebook: " + str(e))
+		sys.exit(1)
+
+	# Use the best 3 round trail for every set of active S-boxes within the target nibbles
+	trails = [trail for trail in trailsearch.search(3, max_active=len(target_nibbles)) if set(trail['boxes']) <= set(target_nibbles)]
+	for trail in trails:
+		print ("Using approximation " + trailsearch.describe(trail))
+
+	ranked = rank_candidates(args['input'], trails, target_nibbles, workers=args['workers'])
+	for candidate, score in ranked[0:args['candidates']]:
+		print ("Candidate: " + str(candidate) + " Score: " + str(score))
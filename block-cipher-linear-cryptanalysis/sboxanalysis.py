@@ -0,0 +1,114 @@
+#!/usr/bin/env python2
+
+# Linear and differential analysis of n x m S-boxes using a fast Walsh-Hadamard transform
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# The S-box is given as a list of 2^n outputs, each an m bit integer. Input and output sums (masks) are integers in the same
+# bit order as the S-box values, exactly as in the Linear Approximation Table loops of linear-cryptanalysis.py.
+
+import sys
+import argparse
+import numpy
+
+
+# Function to work out n and m for an S-box given as a list, unless m is given explicitly. Without it, m is the number of bits
+# needed for the largest output, so an S-box with fewer output bits than input bits gets a table only as wide as its outputs.
+def dimensions(sbox, m=None):
+	n = len(sbox).bit_length() - 1
+	if len(sbox) != 1 << n:
+		raise ValueError("S-box length must be a power of two, not " + str(len(sbox)))
+	if m is None:
+		m = max(1, int(max(sbox)).bit_length())
+	return n, m
+
+
+# Function to return the parity of every value in an integer NumPy array
+def parity(values):
+	x = numpy.array(values, dtype=numpy.int64)
+	shift = 32
+	while shift:
+		x ^= x >> shift
+		shift >>= 1
+	return x & 1
+
+
+# Function to carry out a fast Walsh-Hadamard transform along the first axis of an array whose length is a power of two.
+# Each of the log2(length) butterfly stages is done as one vectorized operation over every column at once.
+def walsh_hadamard(values):
+	w = numpy.array(values, dtype=numpy.int64)
+	size = w.shape[0]
+	columns = w.reshape(size, -1)
+	h = 1
+	while h < size:
+		pairs = columns.reshape(size // (2 * h), 2, h, -1)
+		columns = numpy.concatenate((pairs[:,0] + pairs[:,1], pairs[:,0] - pairs[:,1]), axis=1).reshape(size, -1)
+		h *= 2
+	return columns.reshape(w.shape)
+
+
+# Function to calculate the Walsh spectrum of an S-box. Entry [a][b] is the sum over all inputs x of (-1)^(a.x + b.S(x)).
+def walsh_spectrum(sbox, m=None):
+	n, m = dimensions(sbox, m)
+	outputs = numpy.array(sbox, dtype=numpy.int64).reshape(-1, 1)
+	output_masks = numpy.arange(1 << m, dtype=numpy.int64).reshape(1, -1)
+
+	# Column b holds (-1)^(b.S(x)) for every x. Transforming all the columns at once gives the whole spectrum.
+	signs = 1 - 2 * parity(outputs & output_masks)
+	return walsh_hadamard(signs)
+
+
+# Function to calculate the Linear Approximation Table of an S-box.
+# Entry [a][b] is the number of inputs for which input sum a and output sum b agree, minus 2^(n-1), as printed by linear-cryptanalysis.py.
+def lat(sbox, m=None):
+	return walsh_spectrum(sbox, m) // 2
+
+
+# Function to calculate the Difference Distribution Table of an S-box.
+# Entry [dx][dy] is the number of inputs x for which S(x) XOR S(x XOR dx) = dy.
+def ddt(sbox, m=None):
+	n, m = dimensions(sbox, m)
+	outputs = numpy.array(sbox, dtype=numpy.int64)
+	inputs = numpy.arange(1 << n, dtype=numpy.int64)
+	input_differences = inputs.reshape(-1, 1)
+	output_differences = outputs[inputs.reshape(1, -1)] ^ outputs[inputs.reshape(1, -1) ^ input_differences]
+	index = (input_differences << m) + output_differences
+	return numpy.bincount(index.ravel(), minlength=(1 << n) << m).reshape(1 << n, 1 << m)
+
+
+# Function to calculate the nonlinearity of an S-box, ie the smallest distance from any nonzero output sum to an affine function
+def nonlinearity(sbox, m=None):
+	n, m = dimensions(sbox, m)
+	spectrum = walsh_spectrum(sbox, m)
+	return (1 << (n - 1)) - numpy.abs(spectrum[:,1:]).max() // 2
+
+
+# Function to return the largest absolute bias of any linear approximation with a nonzero output sum, as a fraction
+def max_bias(sbox, m=None):
+	n, m = dimensions(sbox, m)
+	return numpy.abs(lat(sbox, m)[:,1:]).max() / float(1 << n)
+
+
+# Function to return the largest entry in the DDT for a nonzero input difference
+def differential_uniformity(sbox, m=None):
+	return ddt(sbox, m)[1:].max()
+
+
+# Main entry point. Print a summary of the S-box given on the command line.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Print the nonlinearity, maximum bias and differential uniformity of an S-box.')
+	parser.add_argument('-s','--sbox', help='Comma separated list of S-box outputs, eg 4,0,12,3,8,11,10,9,13,14,2,7,6,5,15,1', required=True)
+	parser.add_argument('-m','--output-bits', help='Number of output bits. Worked out from the S-box if not given.', type=int, required=False)
+	args = vars(parser.parse_args())
+
+	sbox = [int(x, 0) for x in args['sbox'].split(',')]
+	try:
+		n, m = dimensions(sbox, args['output_bits'])
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+
+	print ("S-box size: " + str(n) + " x " + str(m))
+	print ("Nonlinearity: " + str(nonlinearity(sbox, m)))
+	print ("Maximum bias: " + str(max_bias(sbox, m)))
+	print ("Differential uniformity: " + str(differential_uniformity(sbox, m)))
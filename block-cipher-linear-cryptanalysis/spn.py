@@ -0,0 +1,254 @@
+#!/usr/bin/env python2
+
+# Table-driven, parameterised implementation of the substitution-permutation network in block-cipher.py working on plain integers
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# An SPN is built from a block width (16, 32 or 64 bits), a number of rounds, the S-boxes for each round, a bit permutation and
+# a key schedule. Every round but the last XORs in a round key, substitutes each S-box sized chunk and permutes the bits. The
+# last round XORs in a round key, substitutes and XORs in one more key, exactly as in the Heys tutorial.
+#
+# The permutation only moves bits around, so the S-boxes and P-box of a round can be folded together into one lookup table per
+# byte of the block, and a round becomes an XOR with the round key followed by one table lookup per byte. Decryption has the
+# same shape, using tables for the inverse P-box applied after the inverse S-boxes and adjusted round keys, so both directions
+# share one engine. Bits are numbered from 0 on the left (most significant), as in BitArray.
+
+import numbers
+import numpy
+
+###
+# Configure subkeys, S-box and P-box of the cipher in block-cipher.py
+
+# The 5 subkeys as integers, the same values as the BitArrays in block-cipher.py
+subkeys = [4132, 8165, 14287, 54321, 53124]
+
+# Hardcoded S box as per our modified cipher specification
+sbox = [4,0,12,3,8,11,10,9,13,14,2,7,6,5,15,1]
+
+# The permutation from block-cipher.py. Output bit i is taken from input bit pbox[i], with bit 0 being the leftmost (most significant) bit
+pbox = [0,4,8,12,1,5,9,13,2,6,10,14,3,7,11,15]
+###
+
+# NumPy types used for each supported block width
+block_types = {16: numpy.uint16, 32: numpy.uint32, 64: numpy.uint64}
+
+
+# Function to apply a P-box to an integer block of len(pbox) bits and return the result
+def permute(block, pbox):
+	width = len(pbox)
+	block_out = 0
+	for i in range(0, width):
+		if block & (1 << (width - 1 - pbox[i])):
+			block_out |= 1 << (width - 1 - i)
+	return block_out
+
+
+# Function to apply the P Box of block-cipher.py to a 16 bit integer and return the result
+def permutation(block):
+	return permute(block, pbox)
+
+
+# Function to return the inverse of a P-box or S-box given as a list
+def invert(table):
+	inverse = [0] * len(table)
+	for i in range(0, len(table)):
+		inverse[table[i]] = i
+	return inverse
+
+
+# Function to build the P-box that generalises the one in block-cipher.py to any width: bit b of S-box j goes to bit j of S-box b
+# (wrapping round when there are more S-boxes than bits per S-box), so no S-box feeds two bits into the same S-box next round
+def transpose_pbox(width, sbox_bits):
+	boxes = width // sbox_bits
+	result = [0] * width
+	for j in range(0, boxes):
+		for b in range(0, sbox_bits):
+			result[b * boxes + j] = j * sbox_bits + b
+	return result
+
+
+# Key schedule for independent round keys. The key is simply the list of rounds+1 round keys.
+def independent_keys(key, width, rounds):
+	if len(key) != rounds + 1:
+		raise ValueError("Need " + str(rounds + 1) + " round keys, not " + str(len(key)))
+	return list(key)
+
+
+# Key schedule that splits one (rounds+1) x width bit master key into round keys, the leftmost bits forming the first round key
+def split_key(key, width, rounds):
+	return [(key >> (width * (rounds - r))) & ((1 << width) - 1) for r in range(0, rounds + 1)]
+
+
+class SPN(object):
+
+	# width is the block size in bits. sboxes is either one S-box used everywhere, or a list with one entry per round, where each
+	# entry is either one S-box used across the whole block or a list of S-boxes from left to right. Any of these can be numpy
+	# arrays or hold numpy or long integers. pbox is the bit permutation,
+	# by default the generalisation of the one in block-cipher.py. key_schedule turns a key into rounds+1 round keys.
+	def __init__(self, width=16, rounds=4, sboxes=sbox, pbox=None, key_schedule=independent_keys):
+		if width not in block_types:
+			raise ValueError("Block width must be 16, 32 or 64 bits, not " + str(width))
+		if isinstance(sboxes[0], numbers.Integral):
+			sboxes = [sboxes] * rounds
+		if len(sboxes) != rounds:
+			raise ValueError("Need S-boxes for " + str(rounds) + " rounds, not " + str(len(sboxes)))
+
+		first_sbox = sboxes[0] if isinstance(sboxes[0][0], numbers.Integral) else sboxes[0][0]
+		sbox_bits = len(first_sbox).bit_length() - 1
+		if sbox_bits not in (2, 4, 8):
+			raise ValueError("S-boxes must be 2, 4 or 8 bits wide")
+		boxes = width // sbox_bits
+
+		# Expand every round to a list of S-boxes from left to right and check they can be inverted
+		self.sboxes = []
+		for round_sboxes in sboxes:
+			if isinstance(round_sboxes[0], numbers.Integral):
+				round_sboxes = [round_sboxes] * boxes
+			if len(round_sboxes) != boxes:
+				raise ValueError("Need " + str(boxes) + " S-boxes per round, not " + str(len(round_sboxes)))
+			round_sboxes = [[int(value) for value in s] for s in round_sboxes]
+			for s in round_sboxes:
+				if sorted(s) != list(range(0, 1 << sbox_bits)):
+					raise ValueError("S-box " + str(s) + " is not a permutation of " + str(sbox_bits) + " bit values")
+			self.sboxes.append(round_sboxes)
+
+		if pbox is None:
+			pbox = transpose_pbox(width, sbox_bits)
+		if sorted(pbox) != list(range(0, width)):
+			raise ValueError("P-box must be a permutation of the " + str(width) + " bit positions")
+
+		self.width = width
+		self.rounds = rounds
+		self.sbox_bits = sbox_bits
+		self.pbox = list(pbox)
+		self.pbox_inverse = invert(pbox)
+		self.key_schedule = key_schedule
+		self.dtype = block_types[width]
+
+		# Encryption layers are P.S for every round but the last, then S. Decryption layers are P^-1.S^-1 from the last round down
+		# to the second, then S^-1 for the first.
+		identity = list(range(0, width))
+		self.encrypt_tables = [self.build_tables(self.sboxes[r], self.pbox) for r in range(0, rounds - 1)]
+		self.encrypt_tables.append(self.build_tables(self.sboxes[rounds - 1], identity))
+		inverse_sboxes = [[invert(s) for s in round_sboxes] for round_sboxes in self.sboxes]
+		self.decrypt_tables = [self.build_tables(inverse_sboxes[r], self.pbox_inverse) for r in range(rounds - 1, 0, -1)]
+		self.decrypt_tables.append(self.build_tables(inverse_sboxes[0], identity))
+
+		# The same tables as NumPy arrays for the batch path, along with the byte shifts
+		self.encrypt_tables_np = [numpy.array(tables, dtype=self.dtype) for tables in self.encrypt_tables]
+		self.decrypt_tables_np = [numpy.array(tables, dtype=self.dtype) for tables in self.decrypt_tables]
+		self.shifts = [width - 8 * (j + 1) for j in range(0, width // 8)]
+		self.shifts_np = [self.dtype(shift) for shift in self.shifts]
+
+		# A 16 bit block is small enough for one 65536 entry table per layer, so each batch round is a single lookup
+		if width == 16:
+			blocks = numpy.arange(65536, dtype=numpy.uint16)
+			self.encrypt_tables_np = [[tables[0][blocks >> 8] | tables[1][blocks & 0xff]] for tables in self.encrypt_tables_np]
+			self.decrypt_tables_np = [[tables[0][blocks >> 8] | tables[1][blocks & 0xff]] for tables in self.decrypt_tables_np]
+
+	# Function to build one 256 entry table per byte of the block for the given S-boxes followed by the given P-box
+	def build_tables(self, round_sboxes, round_pbox):
+		per_byte = 8 // self.sbox_bits
+		mask = (1 << self.sbox_bits) - 1
+		tables = []
+		for j in range(0, self.width // 8):
+			table = [0] * 256
+			for byte in range(0, 256):
+				s = 0
+				for k in range(0, per_byte):
+					shift = self.sbox_bits * (per_byte - 1 - k)
+					s |= round_sboxes[j * per_byte + k][(byte >> shift) & mask] << shift
+				table[byte] = permute(s << (self.width - 8 * (j + 1)), round_pbox)
+			tables.append(table)
+		return tables
+
+	# Function to turn a key into the list of round keys for encryption
+	def round_keys(self, key):
+		keys = self.key_schedule(key, self.width, self.rounds)
+		if len(keys) != self.rounds + 1:
+			raise ValueError("Key schedule must produce " + str(self.rounds + 1) + " round keys")
+		for k in keys:
+			if k < 0 or k >> self.width:
+				raise ValueError("Round key " + str(k) + " does not fit in " + str(self.width) + " bits")
+		return keys
+
+	# Function to turn a key into the list of round keys for decryption, in the order the decryption layers use them
+	def decrypt_round_keys(self, key):
+		keys = self.round_keys(key)
+		return [keys[self.rounds]] + [permute(keys[r], self.pbox_inverse) for r in range(self.rounds - 1, 0, -1)] + [keys[0]]
+
+	# Function to run a single integer block through a list of layer tables and round keys
+	def run(self, block, layers, keys):
+		for r in range(0, len(layers)):
+			block ^= keys[r]
+			tables = layers[r]
+			block_out = 0
+			for j in range(0, len(self.shifts)):
+				block_out |= tables[j][(block >> self.shifts[j]) & 0xff]
+			block = block_out
+		return block ^ keys[-1]
+
+	# Function to run a NumPy array of blocks through a list of layer tables and round keys
+	def run_batch(self, blocks, layers, keys):
+		block = numpy.array(blocks, dtype=self.dtype)
+		byte_mask = self.dtype(0xff)
+		for r in range(0, len(layers)):
+			block ^= self.dtype(keys[r])
+			tables = layers[r]
+			if len(tables) == 1:
+				block = tables[0][block]
+				continue
+			block_out = tables[0][block >> self.shifts_np[0]]
+			for j in range(1, len(self.shifts_np)):
+				block_out |= tables[j][(block >> self.shifts_np[j]) & byte_mask]
+			block = block_out
+		return block ^ self.dtype(keys[-1])
+
+	# Function to encrypt a single integer block
+	def encrypt(self, plaintext, key):
+		return self.run(plaintext, self.encrypt_tables, self.round_keys(key))
+
+	# Function to decrypt a single integer block
+	def decrypt(self, ciphertext, key):
+		return self.run(ciphertext, self.decrypt_tables, self.decrypt_round_keys(key))
+
+	# Function to encrypt a NumPy array of blocks and return the array of ciphertexts
+	def encrypt_batch(self, plaintexts, key):
+		return self.run_batch(plaintexts, self.encrypt_tables_np, self.round_keys(key))
+
+	# Function to decrypt a NumPy array of blocks and return the array of plaintexts
+	def decrypt_batch(self, ciphertexts, key):
+		return self.run_batch(ciphertexts, self.decrypt_tables_np, self.decrypt_round_keys(key))
+
+
+# Preset reproducing the cipher in block-cipher.py
+def heys():
+	return SPN(16, 4, sbox, pbox, independent_keys)
+
+cipher = heys()
+
+
+# Function to carry out four rounds of encryption on a single 16 bit integer and return the ciphertext
+def encrypt(plaintext, keys=subkeys):
+	return cipher.encrypt(plaintext, keys)
+
+
+# Function to encrypt a whole NumPy array of 16 bit plaintexts at once and return the array of ciphertexts
+def encrypt_batch(plaintexts, keys=subkeys):
+	return cipher.encrypt_batch(plaintexts, keys)
+
+
+# Function to carry out four rounds of decryption on a single 16 bit integer and return the plaintext
+def decrypt(ciphertext, keys=subkeys):
+	return cipher.decrypt(ciphertext, keys)
+
+
+# Function to decrypt a whole NumPy array of 16 bit ciphertexts at once and return the array of plaintexts
+def decrypt_batch(ciphertexts, keys=subkeys):
+	return cipher.decrypt_batch(ciphertexts, keys)
+
+
+# Function to generate the full codebook, ie the ciphertext for all 2^16 possible plaintexts
+def codebook(keys=subkeys):
+	plaintexts = numpy.arange(65536, dtype=numpy.uint16)
+	return plaintexts, encrypt_batch(plaintexts, keys)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python2
+
+# Branch and bound search for the best linear trails and differential characteristics through the SPN, for use by the key
+# recovery stages in linearattack.py and differential.py
+# https://github.com/TartarusLabs/Crypto-Tricks/block-cipher-linear-cryptanalysis/
+# james.fell@alumni.york.ac.uk
+
+# A trail over R rounds is a list of masks [u1, u2, ..., uR+1] where u1 is the mask on the round 1 S-box input (and hence on the
+# plaintext) and ur+1 is the mask on the round r+1 S-box input, ie the permuted round r S-box output. Masks use the same bit
+# order as the blocks in spn.py, so bit 1 in the Heys notation is the most significant bit.
+#
+# By the piling up lemma the bias of a trail is 1/2 times the product of 2 x (bias) over all its active S-boxes, so every extra
+# active S-box can only shrink the magnitude. The search works backwards from the last mask, one round at a time, trying the
+# most biased S-box approximations first and abandoning any branch that can no longer beat the best trail found so far.
+# Results for each (round, mask) are memoised, either exactly or as an upper bound when the branch was cut off.
+#
+# A differential characteristic has exactly the same shape, with differences in place of masks, and its probability is simply the
+# product of the DDT probabilities of its active S-boxes, so the same search finds those too.
+
+import sys
+import argparse
+import itertools
+from fractions import Fraction
+import spn
+import sboxanalysis
+
+
+# Function to build, for every S-box output sum, the list of (input sum, 2 x bias) pairs with a nonzero bias,
+# most biased first
+def transitions(sbox):
+	n = len(sbox).bit_length() - 1
+	table = sboxanalysis.lat(sbox)
+	options = []
+	for s_out_bits in range(0, 1 << n):
+		column = [(s_in_bits, table[s_in_bits][s_out_bits] / float(1 << (n - 1))) for s_in_bits in range(0, 1 << n) if table[s_in_bits][s_out_bits] != 0]
+		column.sort(key=lambda option: -abs(option[1]))
+		options.append(column)
+	return options
+
+
+# Function to build, for every S-box output difference, the list of (input difference, probability) pairs with a nonzero
+# probability, most likely first
+def differential_transitions(sbox):
+	n = len(sbox).bit_length() - 1
+	table = sboxanalysis.ddt(sbox)
+	options = []
+	for s_out_bits in range(0, 1 << n):
+		column = [(s_in_bits, table[s_in_bits][s_out_bits] / float(1 << n)) for s_in_bits in range(0, 1 << n) if table[s_in_bits][s_out_bits] != 0]
+		column.sort(key=lambda option: -option[1])
+		options.append(column)
+	return options
+
+
+# Function to search for the best trails through an SPN.
+# Returns a list with one entry per set of active S-boxes in round rounds+1, most biased first. Each entry is a dictionary
+# holding the S-boxes ('boxes', numbered from 0 on the left), the trail bias ('bias') and the masks of the trail ('masks').
+# The plaintext mask is masks[0] and the mask on the last round S-box inputs is masks[-1], which is exactly what
+# linearattack.attack() takes. Only sets of up to max_active S-boxes are searched, as every extra one multiplies the number
+# of key guesses by 2^n. If differential is True the search is for differential characteristics instead. Each entry then holds
+# the probability ('probability') in place of the bias, and 'masks' holds the differences, masks[0] being the plaintext difference.
+def search(rounds, sbox=spn.sbox, pbox=spn.pbox, max_active=2, differential=False):
+	n = len(sbox).bit_length() - 1
+	width = len(pbox)
+	boxes = width // n
+	if differential:
+		options = differential_transitions(sbox)
+	else:
+		options = transitions(sbox)
+	inverse = spn.invert(pbox)
+	memo = {}
+
+	# Find the best trail for rounds 1..r that ends with mask u on the round r+1 S-box inputs, provided its bias magnitude
+	# is above threshold. Returns (2 x bias, masks) or None.
+	def best(r, u, threshold):
+		entry = memo.get((r, u))
+		if entry is not None:
+			value, masks, exact = entry
+			if exact:
+				if abs(value) > threshold:
+					return value, masks
+				return None
+			if value <= threshold:
+				return None
+
+		# The S-box output mask of round r that the permutation turns into u. Masks move through the P-box just like bits.
+		v = spn.permute(u, inverse)
+		active = []
+		for box in range(0, boxes):
+			s_out_bits = (v >> (width - n * (box + 1))) & ((1 << n) - 1)
+			if s_out_bits:
+				active.append((box, options[s_out_bits]))
+
+		result = [threshold, None]
+
+		# Depth first search over the input sums of the active S-boxes, most biased first
+		def extend(depth, mask, product):
+			if abs(product) <= result[0]:
+				return False
+			if depth == len(active):
+				if r == 1:
+					result[0] = abs(product)
+					result[1] = (product, [mask, u])
+				else:
+					earlier = best(r - 1, mask, result[0] / abs(product))
+					if earlier is not None:
+						result[0] = abs(product * earlier[0])
+						result[1] = (product * earlier[0], earlier[1] + [u])
+				return True
+			box, column = active[depth]
+			for s_in_bits, factor in column:
+				# The options are sorted, so once one is too weak all the remaining ones are too
+				if not extend(depth + 1, mask | (s_in_bits << (width - n * (box + 1))), product * factor):
+					break
+			return True
+
+		extend(0, 0, 1.0)
+		if result[1] is None:
+			memo[(r, u)] = (threshold, None, False)
+			return None
+		memo[(r, u)] = (result[1][0], result[1][1], True)
+		return result[1]
+
+	trails = []
+	for count in range(1, max_active + 1):
+		for active_boxes in itertools.combinations(range(0, boxes), count):
+			found = None
+			bound = 0.0
+			for nibbles in itertools.product(range(1, 1 << n), repeat=count):
+				u = 0
+				for box, s_in_bits in zip(active_boxes, nibbles):
+					u |= s_in_bits << (width - n * (box + 1))
+				trail = best(rounds, u, bound)
+				if trail is not None:
+					found = trail
+					bound = abs(trail[0])
+			if found is not None and differential:
+				trails.append({'boxes': active_boxes, 'probability': found[0], 'masks': found[1]})
+			elif found is not None:
+				trails.append({'boxes': active_boxes, 'bias': found[0] / 2, 'masks': found[1]})
+	trails.sort(key=lambda trail: -abs(trail.get('bias', trail.get('probability'))))
+	return trails
+
+
+# Function to describe a trail as an approximation in the notation of the Heys tutorial, eg P1 + U4,2 + U4,6 = 0, or a
+# differential characteristic as its input and output differences in binary
+def describe(trail, width=16):
+	rounds = len(trail['masks']) - 1
+	if 'probability' in trail:
+		dp = "{0:b}".format(trail['masks'][0]).zfill(width)
+		du = "{0:b}".format(trail['masks'][-1]).zfill(width)
+		dp = " ".join(dp[i:i+4] for i in range(0, width, 4))
+		du = " ".join(du[i:i+4] for i in range(0, width, 4))
+		return "dP = " + dp + " -> dU" + str(rounds + 1) + " = " + du + " with probability " + str(Fraction(trail['probability']))
+	terms = ["P" + str(bit + 1) for bit in range(0, width) if trail['masks'][0] & (1 << (width - 1 - bit))]
+	terms += ["U" + str(rounds + 1) + "," + str(bit + 1) for bit in range(0, width) if trail['masks'][-1] & (1 << (width - 1 - bit))]
+	return " + ".join(terms) + " = 0 with bias " + str(Fraction(trail['bias']))
+
+
+# Main entry point. Print the best trails for the requested number of rounds.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Search for the best linear trails or differential characteristics through the SPN in spn.py.')
+	parser.add_argument('-r','--rounds', help='Number of rounds the trail covers. Default is 3, for attacking the 4 round cipher.', type=int, default=3)
+	parser.add_argument('-a','--active', help='Maximum number of active S-boxes in the round after the trail. Default is 2.', type=int, default=2)
+	parser.add_argument('-d','--differential', help='Search for differential characteristics instead of linear trails.', action='store_true')
+	args = vars(parser.parse_args())
+
+	if args['rounds'] < 1:
+		print ("Number of rounds must be at least 1")
+		sys.exit(1)
+
+	for trail in search(args['rounds'], max_active=args['active'], differential=args['differential']):
+		print ("S-boxes " + str(list(trail['boxes'])) + ": " + describe(trail))
@@ -73,4 +73,5 @@ def getStats(coverImage, stegoImage):
 	stego.close()
 
 # Run the tests on the cover image and the stego image
-getStats("in.png", "out.png")
+if __name__ == '__main__':
+	getStats("in.png", "out.png")
@@ -6,23 +6,92 @@
 
 import png
 import binascii
+import hashlib
 import random
-import math
 import sys
 import argparse
-
-
-# Read and process the command line arguments
-parser = argparse.ArgumentParser(description='Hide text files inside PNG images using LSB steganography.')
-parser.add_argument('-m','--mode', help='Set mode to embed or recover', required=True)
-parser.add_argument('-i','--image', help='Image to read. If embedding this is the cover image, if recovering this is the stego image.', required=True)
-parser.add_argument('-p','--password', help='Password.', required=True)
-parser.add_argument('-t','--text', help='Text file to read. Only reuired if mode is embed.', required=False)
-args = vars(parser.parse_args())
+import numpy
+
+# Number of rounds of the Feistel network used to permute the LSBs, at most 8 as each takes a 64 bit word of a SHA-512 hash
+feistel_rounds = 8
+
+
+# Function to read in and parse the contents of an RGBA image. Returns the width, height, the pixels as one contiguous array
+# with a row of bytes for each row of the image, a view of that array holding only the RGB channels, and the PNG metadata.
+def read_pixels(imageFile):
+	reader = png.Reader(file=imageFile)
+	imageWidth, imageHeight, rows, imageInfo = reader.read()
+	pixels = numpy.vstack([numpy.frombuffer(row, dtype=numpy.uint8) for row in rows])
+	channels = pixels.reshape(imageHeight, imageWidth, 4)[:, :, 0:3]
+	return imageWidth, imageHeight, pixels, channels, imageInfo
+
+
+# Function to turn LSB numbers, which count through the Red, Green and Blue components of each pixel from the top left, into
+# indexes of the RGB view of the pixels
+def lsb_indexes(ordering, channels):
+	return numpy.unravel_index(numpy.array(ordering, dtype=numpy.intp), channels.shape)
+
+
+# Function to mix the right half of every block with a round key, the round function of the Feistel network. This is the 64 bit
+# finaliser of the SplitMix generator applied to the half XOR the key, keeping only as many bits as there are in a half.
+def mix(half, key, halfBits):
+	with numpy.errstate(over='ignore'):
+		z = half ^ key
+		z = (z ^ (z >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+		z = (z ^ (z >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+		z = z ^ (z >> numpy.uint64(31))
+	return z & numpy.uint64((1 << halfBits) - 1)
+
+
+# Function to encrypt an array of blocks of 2 x halfBits bits with a balanced Feistel network under the given round keys
+def feistel(blocks, keys, halfBits):
+	mask = numpy.uint64((1 << halfBits) - 1)
+	left = blocks >> numpy.uint64(halfBits)
+	right = blocks & mask
+	for key in keys:
+		left, right = right, left ^ mix(right, key, halfBits)
+	return (left << numpy.uint64(halfBits)) | right
+
+
+class Ordering(object):
+
+	# The pseudorandom permutation of the LSBs of an image for a password. By default it is a Feistel network keyed by a hash of
+	# the password, which encrypts places in the permutation to LSB numbers. The network works on blocks of an even number of bits
+	# covering every LSB number, and whenever a block encrypts to a number past the last LSB it is encrypted again until it lands
+	# on one. This cycle walking keeps the result a permutation of the LSBs [13]. Only the places asked for are computed, so a
+	# short message costs the same however large the image. With compat set it is instead the shuffle of every LSB with Python's
+	# random module seeded with the password, which earlier versions of this script used.
+	def __init__(self, password, maxHideBits, compat=False):
+		self.password = password
+		self.size = maxHideBits
+		self.compat = compat
+		self.shuffled = None
+		digest = hashlib.sha512(password).digest()
+		self.keys = [numpy.uint64(int(binascii.hexlify(digest[8 * i:8 * i + 8]), 16)) for i in range(0, feistel_rounds)]
+		self.halfBits = max(1, ((maxHideBits - 1).bit_length() + 1) // 2)
+
+	# Function to return the LSB numbers at places start to start + count - 1 of the permutation, stopping at the last LSB
+	def positions(self, start, count):
+		end = min(start + count, self.size)
+		if start >= end:
+			return numpy.zeros(0, dtype=numpy.uint64)
+		if self.compat:
+			if self.shuffled is None:
+				self.shuffled = range(self.size)
+				random.seed(self.password)
+				random.shuffle(self.shuffled)
+			return numpy.array(self.shuffled[start:end], dtype=numpy.uint64)
+
+		lsbs = feistel(numpy.arange(start, end, dtype=numpy.uint64), self.keys, self.halfBits)
+		outside = numpy.nonzero(lsbs >= self.size)[0]
+		while len(outside):
+			lsbs[outside] = feistel(lsbs[outside], self.keys, self.halfBits)
+			outside = outside[lsbs[outside] >= self.size]
+		return lsbs
 
 
 # Function to embed a hidden message into a cover image
-def stego_embed(coverImageFile, hiddenMessageFile, password):
+def stego_embed(coverImageFile, hiddenMessageFile, password, compat=False):
 
 	# Open the cover image and hidden message files
 	coverImage = open(coverImageFile, 'rb')
@@ -36,12 +105,7 @@ def stego_embed(coverImageFile, hiddenMessageFile, password):
 	messageBinary = bin(len(messageBinary))[2:].zfill(24) + messageBinary
 
 	# Read in and parse the contents of the cover image
-	reader = png.Reader(file=coverImage)
-	coverContent = reader.read()
-	imageWidth = coverContent[0]
-	imageHeight = coverContent[1]
-	coverPixels = list(coverContent[2])
-	coverInfo = coverContent[3]
+	imageWidth, imageHeight, coverPixels, coverChannels, coverInfo = read_pixels(coverImage)
 
 	# Calculate the maximum number of bits we can hide in this cover image
 	maxHideBits = imageWidth * imageHeight * 3
@@ -51,34 +115,20 @@ def stego_embed(coverImageFile, hiddenMessageFile, password):
 		print ("Sorry, this cover image can only hide up to " + str(maxHideBits) + " bits of data but you are trying to hide " + str(len(messageBinary)) + " bits (including 24 bit header we add). Please use a bigger cover image.")
 		sys.exit()
 
-	# Generate a pseudorandom permutation of all available LSBs in cover image based on the password as a seed
-	ordering = range(maxHideBits)
-	random.seed(password)
-	random.shuffle(ordering)
-
-	# Initialise a new counter
-	bitCounter = 0
-
-	# For every LSB in our pseudorandom permutation
-	for lsb in ordering:
+	# Set up a pseudorandom permutation of all available LSBs in cover image based on the password
+	ordering = Ordering(password, maxHideBits, compat)
 
-		# Stop when we reach the end of the message
-		if bitCounter == len(messageBinary):
-	        	break
+	# The message uses the first LSBs in our pseudorandom permutation, one for each of its bits
+	bitCounter = len(messageBinary)
+	lsbs = lsb_indexes(ordering.positions(0, bitCounter), coverChannels)
 
-		# Calculate the row and column in the image array that corresponds to the next LSB to manipulate
-		row = int(math.floor(lsb / (imageWidth * 3)))
-		col = lsb - (imageWidth * 3 * row)
-		col = col + int(math.floor(col / 3))
-
-		# Set the LSB value to the next bit of the message we are hiding
-		if messageBinary[bitCounter] == '1':
-			coverPixels[row][col] = coverPixels[row][col] | 1
-		elif messageBinary[bitCounter] == '0':
-			coverPixels[row][col] = coverPixels[row][col] & 254
-
-		# Increment counter
-		bitCounter += 1
+	# Set each of those LSBs to its bit of the message we are hiding, all at once. Any character in the message other than a
+	# 0 or a 1 leaves its LSB as it was.
+	message = numpy.frombuffer(messageBinary.encode('ascii'), dtype=numpy.uint8)
+	values = coverChannels[lsbs]
+	values[message == ord('1')] |= 1
+	values[message == ord('0')] &= 254
+	coverChannels[lsbs] = values
 
 	# Display some stats for the user
 	print ("Data hidden (including 24 bit header we add): " + str(bitCounter) + " bits.")
@@ -88,7 +138,7 @@ def stego_embed(coverImageFile, hiddenMessageFile, password):
 	print ("Saving resulting stego image to out.png")
 
 	# Write the stego image to disk
-	png.from_array(coverPixels, 'RGBA', coverInfo).save('out.png')
+	png.from_array(coverPixels.tolist(), 'RGBA', coverInfo).save('out.png')
 
 	# Close the files
 	coverImage.close()
@@ -96,57 +146,30 @@ def stego_embed(coverImageFile, hiddenMessageFile, password):
 
 
 # Function to recover a hidden message from a stego image
-def stego_recover(stegoImageFile, password):
+def stego_recover(stegoImageFile, password, compat=False):
 
 	# Open the stego image and a new text file to save the recovered message into
 	stegoImage = open(stegoImageFile, 'rb')
 	hiddenMessage = open('out.txt', 'w')
 
 	# Read in and parse the contents of the stego image
-	reader = png.Reader(file=stegoImage)
-	coverContent = reader.read()
-	imageWidth = coverContent[0]
-	imageHeight = coverContent[1]
-	coverPixels = list(coverContent[2])
-	coverInfo = coverContent[3]
+	imageWidth, imageHeight, coverPixels, coverChannels, coverInfo = read_pixels(stegoImage)
 
 	# Calculate the maximum number of bits that can have been hidden in this stego image
 	maxHideBits = imageWidth * imageHeight * 3
 
-	# Generate a pseudorandom permutation of all available LSBs in cover image based on the password as a seed
-	ordering = range(maxHideBits)
-	random.seed(password)
-	random.shuffle(ordering)
-
-	# Initialise counters and empty string to store recovered message in
-	messageSize = 0
-	bitCounter = 0
-	messageBinary = ''
+	# Set up a pseudorandom permutation of all available LSBs in cover image based on the password
+	ordering = Ordering(password, maxHideBits, compat)
 
-	# For every LSB in our pseudorandom permutation
-	for lsb in ordering:
+	# Read the first 24 LSBs in our pseudorandom permutation to get the header, which tells us how much more data to extract
+	header = coverChannels[lsb_indexes(ordering.positions(0, 24), coverChannels)] & 1
+	messageSize = int((header + ord('0')).tobytes(), 2)
 
-		# Calculate the row and column in the image array that corresponds to the next LSB to read
-		row = int(math.floor(lsb / (imageWidth * 3)))
-		col = lsb - (imageWidth * 3 * row)
-		col = col + int(math.floor(col / 3))
-
-		# Read the LSB value to get the next bit of the message that was hidden
-		messageBinary = messageBinary + str(coverPixels[row][col] & 1)
-
-		# Once we have the first 24 bits, we know how much more data to extract
-		if bitCounter == 23:
-			messageSize = int(messageBinary, 2)
-
-	               	# Discard first 24 bits now
-			messageBinary = ''
-
-		# Check if we have extracted all of the hidden message yet
-		if bitCounter == (messageSize-1) + 24:
-			break
-
-		# Increment counter
-		bitCounter += 1
+	# Read the LSBs holding the hidden message all at once and turn them into a string of 0s and 1s. If the header claims more
+	# bits than the image can hold, everything after the header is read.
+	bitCounter = min(messageSize + 23, maxHideBits)
+	bits = coverChannels[lsb_indexes(ordering.positions(24, messageSize), coverChannels)] & 1
+	messageBinary = (bits + ord('0')).tobytes()
 
 	# Display some stats and progress for the user
 	print ("Data extracted (excluding 24 bit header): " + str(bitCounter + 1 - 24) + " bits.")
@@ -162,8 +185,17 @@ def stego_recover(stegoImageFile, password):
 
 
 
-# Main entry point. Examine the command line arguments and act on them.
-if args['mode'] == 'embed':
-	stego_embed(args['image'], args['text'], args['password'])
-elif args['mode'] == 'recover':
-	stego_recover(args['image'], args['password'])
+# Main entry point. Read and process the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Hide text files inside PNG images using LSB steganography.')
+	parser.add_argument('-m','--mode', help='Set mode to embed or recover', required=True)
+	parser.add_argument('-i','--image', help='Image to read. If embedding this is the cover image, if recovering this is the stego image.', required=True)
+	parser.add_argument('-p','--password', help='Password.', required=True)
+	parser.add_argument('-t','--text', help='Text file to read. Only reuired if mode is embed.', required=False)
+	parser.add_argument('-c','--compat', help='Use the shuffled ordering of LSBs from earlier versions, to recover their stego images.', action='store_true')
+	args = vars(parser.parse_args())
+
+	if args['mode'] == 'embed':
+		stego_embed(args['image'], args['text'], args['password'], args['compat'])
+	elif args['mode'] == 'recover':
+		stego_recover(args['image'], args['password'], args['compat'])
@@ -0,0 +1,287 @@
+#!/usr/bin/env python2
+
+# Combiner generators described declaratively, with a divide and conquer attack planned automatically from the Walsh spectrum
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# A cipher is described in a JSON file such as stream-cipher.json, as a list of registers, each with a name, a length and a tap
+# sequence, and a combining function given as a truth table in the same form as boolean_outputs. Register i supplies input i of
+# the combining function, the first register being the most significant bit of the truth table index.
+#
+# The Walsh spectrum of the combining function says how often the output agrees with the XOR of each subset of its inputs. Any
+# subset whose agreement is not exactly a half can be attacked on its own, guessing the initial states of the registers in the
+# subset that are not yet known and XORing the output of the known ones into the keystream. The XOR of several LFSRs is linear in
+# their combined initial state, so the same Walsh-Hadamard scan as correlation.py scores every joint guess at once. Once every
+# other register is known, the rest can be brute forced by matching the keystream exactly.
+#
+# The planner works through every set of known registers from smallest to largest, keeping the cheapest way found to reach
+# each one, measured by the number of initial states to be tried, so it finds the cheapest sequence of first and higher order
+# correlation attacks and brute force steps. The keystream each step needs is estimated from its agreement rate.
+
+import sys
+import json
+import math
+import time
+import argparse
+import numpy
+from bitstring import BitArray
+import lfsr
+import packed
+import correlation
+
+# Largest combined register length scanned in one go, as the scan needs 2^length entries
+max_scan_bits = 26
+
+# Largest combined register length brute forced
+max_brute_force_bits = 40
+
+# Number of standard deviations between the correct guess and the best of the wrong ones when estimating the keystream needed
+safety_margin = 3.0
+
+# Extra bits of keystream beyond the number of key bits when brute forcing, so that only the correct guess matches exactly
+brute_force_margin = 32
+
+# Number of candidate initial states brute forced at a time
+brute_force_batch = 4096
+
+
+# Function to read a cipher description from a JSON file and check it
+def load(filename):
+	with open(filename, 'r') as infile:
+		description = json.load(infile)
+	registers = description.get('registers', [])
+	truth_table = description.get('combining_function', [])
+	if not registers:
+		raise ValueError("The description has no registers")
+	if len(truth_table) != 2 ** len(registers) or [output for output in truth_table if output not in (0, 1)]:
+		raise ValueError("The combining function must be a truth table of 2^" + str(len(registers)) + " 0s and 1s")
+	for register in registers:
+		if register['length'] < 1 or register['length'] > 64:
+			raise ValueError("Register " + register['name'] + " must be between 1 and 64 bits")
+		if [tap for tap in register['taps'] if tap < 1 or tap > register['length']]:
+			raise ValueError("Register " + register['name'] + " has a tap outside the register")
+	return description
+
+
+# Function to calculate the Walsh spectrum of a truth table. Entry w is the sum over x of (-1)^(f(x) ^ w.x), so the output agrees
+# with the XOR of the inputs selected by w a fraction 1/2 + spectrum[w] / 2^(n+1) of the time.
+def walsh_spectrum(truth_table):
+	signs = numpy.array([1 - 2 * output for output in truth_table], dtype=numpy.int64)
+	return [int(value) for value in correlation.walsh_hadamard(signs)]
+
+
+# Function to turn a mask of register indexes as used by the planner, bit i for register i, into the truth table input mask
+def input_mask(mask, count):
+	return sum(1 << (count - 1 - i) for i in range(0, count) if (mask >> i) & 1)
+
+
+# Function to list the register indexes in a mask
+def members(mask, count):
+	return [i for i in range(0, count) if (mask >> i) & 1]
+
+
+# Function to estimate the keystream needed to pick the correct one of 2^bits guesses out when it agrees with the keystream a
+# fraction agreement of the time and the wrong ones agree half the time. The correct score stands out from the wrong ones by
+# about N x |2 x agreement - 1| against a spread of sqrt(N), and the best of 2^bits wrong scores is about sqrt(2 x bits x ln 2)
+# spreads above the rest.
+def keystream_needed(bits, agreement):
+	if agreement in (0.0, 1.0):
+		return bits + brute_force_margin
+	return int(math.ceil(((math.sqrt(2 * bits * math.log(2)) + safety_margin) / abs(2 * agreement - 1)) ** 2))
+
+
+# Function to plan the cheapest attack on a described cipher given keybits bits of keystream.
+# Returns a list of steps, each a dictionary saying which registers it recovers, how, and its estimated cost.
+def plan(description, keybits):
+	registers = description['registers']
+	count = len(registers)
+	everything = (1 << count) - 1
+	spectrum = walsh_spectrum(description['combining_function'])
+	bits = [sum(registers[i]['length'] for i in members(mask, count)) for mask in range(0, 1 << count)]
+
+	# best[known] is (total candidates, total keystream, steps) for the cheapest way found to know that set of registers
+	best = {0: (0, 0, [])}
+	for known in range(0, everything):
+		if known not in best:
+			continue
+		total, needed, steps = best[known]
+		options = []
+
+		# Correlation attacks on every subset of inputs that is not balanced against the output
+		for mask in range(1, 1 << count):
+			guessed = mask & ~known
+			agreement = 0.5 + spectrum[input_mask(mask, count)] / float(2 ** (count + 1))
+			if not guessed or agreement == 0.5 or bits[guessed] > max_scan_bits:
+				continue
+			options.append({'kind': 'correlation', 'mask': mask, 'guessed': guessed, 'agreement': agreement})
+
+		# Brute force of everything that is left
+		if bits[everything & ~known] <= max_brute_force_bits:
+			options.append({'kind': 'brute force', 'mask': everything, 'guessed': everything & ~known, 'agreement': 1.0})
+
+		for step in options:
+			step['candidates'] = 2 ** bits[step['guessed']]
+			step['keystream'] = keystream_needed(bits[step['guessed']], step['agreement'])
+			if step['keystream'] > keybits:
+				continue
+			option = (total + step['candidates'], max(needed, step['keystream']), steps + [step])
+			reached = known | step['guessed']
+			if reached not in best or option[0:2] < best[reached][0:2]:
+				best[reached] = option
+
+	if everything not in best:
+		raise ValueError("No attack found with " + str(keybits) + " bits of keystream")
+	return best[everything][2]
+
+
+# Function to describe one step of a plan in words
+def describe(description, step):
+	registers = description['registers']
+	count = len(registers)
+	guessed = ", ".join(registers[i]['name'] for i in members(step['guessed'], count))
+	if step['kind'] == 'brute force':
+		how = "brute force matching the keystream exactly"
+	else:
+		inputs = " XOR ".join(registers[i]['name'] for i in members(step['mask'], count))
+		how = "correlation of " + inputs + " agreeing " + str(step['agreement']) + " of the time"
+	return guessed + " by " + how + ", " + str(step['candidates']) + " candidates, " + str(step['keystream']) + " bits of keystream"
+
+
+# Function to generate the first keybits bits of output of some registers from their initial states, packed into words
+def outputs(description, states, keybits):
+	registers = description['registers']
+	return dict((i, lfsr.engine(registers[i]['taps'], registers[i]['length']).output(state, keybits)) for i, state in states.items())
+
+
+# Function to generate the first keybits bits of output of several registers for a batch of joint states, the first register in
+# the most significant bits. Returns a dictionary of arrays of packed words, one row per joint state, by register index.
+def register_outputs(description, indexes, joints, keybits):
+	joints = numpy.asarray(joints, dtype=numpy.uint64)
+	streams = {}
+	shift = 0
+	for i in reversed(indexes):
+		register = description['registers'][i]
+		states = (joints >> numpy.uint64(shift)) & numpy.uint64((1 << register['length']) - 1)
+		streams[i] = lfsr.engine(register['taps'], register['length']).output(states, keybits)
+		shift += register['length']
+	return streams
+
+
+# Function to split a joint state of several registers, the first register in the most significant bits, into their states
+def split(description, indexes, joint):
+	states = {}
+	for i in reversed(indexes):
+		length = description['registers'][i]['length']
+		states[i] = joint & ((1 << length) - 1)
+		joint >>= length
+	return states
+
+
+# Function to run one correlation step, given the keystream and the states already known.
+# Returns the states of the guessed registers.
+def correlation_step(description, step, keystream, keybits, known):
+	registers = description['registers']
+	count = len(registers)
+
+	# XOR the output of the registers already known out of the keystream
+	target = packed.pack(keystream, keybits)
+	known_outputs = outputs(description, dict((i, known[i]) for i in members(step['mask'] & ~step['guessed'], count)), keybits)
+	for words in known_outputs.values():
+		target = target ^ words
+
+	# Each output bit of the guessed registers together is the parity of the joint state and the masks of all of them combined
+	indexes = members(step['guessed'], count)
+	masks = numpy.zeros(keybits, dtype=numpy.int64)
+	for i in indexes:
+		masks = (masks << registers[i]['length']) | correlation.output_masks(registers[i]['taps'], registers[i]['length'], keybits)
+	length = sum(registers[i]['length'] for i in indexes)
+	agreements = correlation.scan_masks(masks, length, packed.unpack(target, keybits), keybits)
+	joint, agreement = correlation.ranked(agreements, keybits, 1)[0]
+	return split(description, indexes, joint)
+
+
+# Function to run a brute force step, trying every joint state of the registers left until the keystream matches exactly.
+# Returns the states of the guessed registers, or None.
+def brute_force_step(description, step, keystream, keybits, known):
+	registers = description['registers']
+	count = len(registers)
+	indexes = members(step['guessed'], count)
+	target = packed.pack(keystream, keybits)
+	known_outputs = outputs(description, known, keybits)
+	length = sum(registers[i]['length'] for i in indexes)
+
+	for start in range(0, 1 << length, brute_force_batch):
+		joints = numpy.arange(start, min(start + brute_force_batch, 1 << length), dtype=numpy.uint64)
+		streams = register_outputs(description, indexes, joints, keybits)
+		streams.update(known_outputs)
+		inputs = [streams[i] for i in range(0, count)]
+		matches = numpy.nonzero(packed.agreement(packed.combine(description['combining_function'], inputs), target, keybits) == keybits)[0]
+		if len(matches):
+			return split(description, indexes, int(joints[matches[0]]))
+	return None
+
+
+# Function to run a plan against a keystream. Returns the initial state of every register, by index.
+def attack(description, steps, keystream, keybits, verbose=False):
+	known = {}
+	for step in steps:
+		startTime = time.time()
+		if step['kind'] == 'brute force':
+			found = brute_force_step(description, step, keystream, keybits, known)
+			if found is None:
+				raise ValueError("No initial states of the remaining registers match the keystream")
+		else:
+			found = correlation_step(description, step, keystream, keybits, known)
+		known.update(found)
+		if verbose:
+			for i in sorted(found):
+				print ("Recovered " + description['registers'][i]['name'] + " initial state: " + str(found[i]) + " in " + str(time.time() - startTime) + " seconds")
+	return known
+
+
+# Function to generate keybits bits of keystream from a described cipher and the initial states of its registers
+def keystream(description, states, keybits):
+	streams = outputs(description, states, keybits)
+	return packed.unpack(packed.combine(description['combining_function'], [streams[i] for i in range(0, len(states))]), keybits)
+
+
+# Main entry point. Plan the attack, print the plan and run it.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Plan and run a divide and conquer correlation attack on a combiner generator described in a JSON file.')
+	parser.add_argument('-d','--description', help='JSON description of the cipher. Default is stream-cipher.json.', default='stream-cipher.json')
+	parser.add_argument('-i','--input', help='Keystream file of 0s and 1s to attack. Default is stream.txt.', default='stream.txt')
+	parser.add_argument('-p','--plan', help='Only print the plan, without running it.', action='store_true')
+	args = vars(parser.parse_args())
+
+	with open(args['input'], 'r') as samples:
+		sample_keystream = BitArray('bin=' + samples.read().replace(' ', '').strip())
+	keybits = sample_keystream.len
+
+	try:
+		description = load(args['description'])
+		steps = plan(description, keybits)
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+
+	total_bits = sum(register['length'] for register in description['registers'])
+	print ("Attack plan:")
+	for number, step in enumerate(steps):
+		print (str(number + 1) + ". " + describe(description, step))
+	print ("Total candidates: " + str(sum(step['candidates'] for step in steps)) + " against 2^" + str(total_bits) + " = " + str(2 ** total_bits) + " for brute force on the whole key")
+	print ("Keystream needed: about " + str(max(step['keystream'] for step in steps)) + " bits of the " + str(keybits) + " available")
+	if args['plan']:
+		sys.exit(0)
+
+	print ("")
+	try:
+		states = attack(description, steps, sample_keystream, keybits, verbose=True)
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+
+	if keystream(description, states, keybits) == sample_keystream:
+		print ("The recovered initial states reproduce the keystream")
+	else:
+		print ("The recovered initial states do not reproduce the keystream")
+		sys.exit(1)
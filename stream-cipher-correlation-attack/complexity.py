@@ -0,0 +1,225 @@
+#!/usr/bin/env python2
+
+# Linear complexity profile of the keystream, measured with the Berlekamp-Massey algorithm as the keystream is generated
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# The linear complexity of a sequence is the length of the shortest LFSR that generates it, and the Berlekamp-Massey algorithm
+# finds that LFSR from 2 x L bits of the sequence. On its own, each of our LFSRs has a linear complexity equal to its length,
+# and XORing all four together would give only 7 + 11 + 13 + 15 = 46. The combining function is what is meant to push it up.
+# When the LFSRs have maximal periods and distinct lengths, the linear complexity of the keystream is the algebraic normal form
+# of the combining function evaluated over the integers with the length of each LFSR in place of its input [5].
+#
+# The measurement runs a bit at a time, holding the connection polynomial and the most recent bits of keystream in Python
+# integers, which are arbitrarily long packed words, so every step is a few operations on whole words. Once the current LFSR
+# has predicted as many bits in a row as its length, the rest of each chunk is checked in one go by XORing the chunk with
+# shifted copies of itself, one for each tap. Only if that finds a bit the LFSR gets wrong does the algorithm go back to a bit at
+# a time from that bit. This keeps millions of bits quick once the profile has stabilised.
+
+import os
+import imp
+import sys
+import time
+import argparse
+import numpy
+from bitstring import BitArray
+
+# Number of bits of keystream profiled by default
+profile_bits = 1 << 20
+
+# Bytes of keystream generated at a time
+chunk_bytes = 1 << 16
+
+# Smallest window of recent keystream kept for the bit at a time steps, in bits
+minimum_window = 4096
+
+
+# Function to compute the algebraic normal form of a truth table with the Moebius transform. Entry u is 1 when the monomial of
+# the inputs set in u, the first input in the most significant bit, appears in the ANF.
+def anf(truth_table):
+	coefficients = list(truth_table)
+	half = 1
+	while half < len(coefficients):
+		for index in range(0, len(coefficients)):
+			if index & half:
+				coefficients[index] ^= coefficients[index ^ half]
+		half *= 2
+	return coefficients
+
+
+# Function to work out the linear complexity of the keystream of a described cipher from the ANF of its combining function.
+# Returns the complexity and a list of (names of the registers in a monomial, complexity it contributes).
+def theoretical(description):
+	registers = description['registers']
+	count = len(registers)
+	terms = []
+	for mask, coefficient in enumerate(anf(description['combining_function'])):
+		if not coefficient:
+			continue
+		inputs = [i for i in range(0, count) if (mask >> (count - 1 - i)) & 1]
+		product = 1
+		for i in inputs:
+			product *= registers[i]['length']
+		terms.append((".".join(registers[i]['name'] for i in inputs) or "1", product))
+	return sum(product for name, product in terms), terms
+
+
+# Function to reverse the order of the lowest width bits of an integer
+def reverse(value, width):
+	return int(bin(value)[2:].zfill(width)[::-1], 2) if width else 0
+
+
+class BerlekampMassey(object):
+
+	# The connection polynomial C and the one before the last length change B have the coefficient of x^i in bit i. recent holds
+	# the last window bits of the sequence, the newest in bit 0, and history holds every bit, the first in bit 0.
+	def __init__(self):
+		self.connection = 1
+		self.previous = 1
+		self.complexity = 0
+		self.change = -1
+		self.position = 0
+		self.history = 0
+		self.recent = 0
+		self.window = minimum_window
+		self.taps = [0]
+		self.profile = []
+
+	# Function to refill recent from history, after the window is widened or bits were consumed without it
+	def refill(self):
+		width = min(self.window, self.position)
+		self.recent = reverse((self.history >> (self.position - width)) & ((1 << width) - 1), width)
+
+	# Function to run one step of the algorithm on the next bit of the sequence
+	def step(self, bit):
+		self.recent = ((self.recent << 1) | bit) & ((1 << self.window) - 1)
+		if bin(self.connection & self.recent).count("1") & 1:
+			connection = self.connection
+			self.connection ^= self.previous << (self.position - self.change)
+			if 2 * self.complexity <= self.position:
+				self.complexity = self.position + 1 - self.complexity
+				self.previous = connection
+				self.change = self.position
+				self.profile.append((self.position + 1, self.complexity))
+			self.taps = [i for i, coefficient in enumerate(reversed(bin(self.connection)[2:])) if coefficient == '1']
+		self.position += 1
+
+	# Function to find the first of the next count bits of history that the current LFSR gets wrong, checking them all at once.
+	# Returns count if it gets them all right.
+	def predicted(self, count):
+		length = self.complexity
+		block = (self.history >> (self.position - length)) & ((1 << (length + count)) - 1)
+		residue = 0
+		for tap in self.taps:
+			residue ^= block << tap
+		wrong = (residue >> length) & ((1 << count) - 1)
+		return (wrong & -wrong).bit_length() - 1 if wrong else count
+
+	# Function to feed the next chunk of the sequence, given as bytes, into the algorithm. Only the first count bits are used if
+	# count is given.
+	def update(self, chunk, count=None):
+		bits = numpy.unpackbits(numpy.frombuffer(chunk, dtype=numpy.uint8))[0:count]
+		if not len(bits):
+			return
+		self.history |= int(BitArray(bytes=chunk)[0:len(bits)][::-1].bin, 2) << self.position
+		end = self.position + len(bits)
+		while self.position < end:
+			# Once the LFSR has predicted as many bits in a row as its length, check the rest of the chunk in one go
+			if self.complexity and self.position - self.change > self.complexity:
+				skipped = self.predicted(end - self.position)
+				self.position += skipped
+				if self.position == end:
+					break
+				self.refill()
+			self.step(int(bits[len(bits) - (end - self.position)]))
+			if 2 * self.complexity + 1 > self.window:
+				self.window = 4 * self.complexity
+				self.refill()
+
+	# Function to return the linear complexity of the first position bits of the sequence, from the profile
+	def complexity_at(self, position):
+		complexity = 0
+		for changed, value in self.profile:
+			if changed > position:
+				break
+			complexity = value
+		return complexity
+
+	# Function to say whether the profile has stabilised: the complexity has not changed for the last settle bits, and at least
+	# as many bits as twice the complexity have been seen, so the LFSR found is the only one of its length
+	def stable(self, settle):
+		return self.position - self.change - 1 >= settle and self.position >= 2 * self.complexity
+
+
+# Function to load stream-cipher.py, whose name is not a valid module name, for its keystream generator
+def load_cipher():
+	return imp.load_source('stream_cipher', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stream-cipher.py'))
+
+
+# Function to measure the linear complexity profile of up to bits bits of a keystream given as an iterator of byte chunks,
+# stopping early once the profile has been stable for settle bits if settle is given. Returns the BerlekampMassey object.
+def measure(chunks, bits, settle=None):
+	algorithm = BerlekampMassey()
+	for chunk in chunks:
+		algorithm.update(chunk, bits - algorithm.position)
+		if algorithm.position >= bits or (settle and algorithm.stable(settle)):
+			break
+	return algorithm
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Measure the linear complexity profile of the keystream with the Berlekamp-Massey algorithm.')
+	parser.add_argument('-k','--key', help='Comma separated initial states of the LFSRs. Default is the key in stream-cipher.py.', required=False)
+	parser.add_argument('-n','--number', help='Number of bits of keystream to profile. Default is ' + str(profile_bits) + '.', type=int, default=profile_bits)
+	parser.add_argument('-s','--settle', help='Stop once the complexity has not changed for this many bits', type=int, required=False)
+	parser.add_argument('-p','--profile', help='Print every change in the linear complexity profile rather than a sample of it.', action='store_true')
+	parser.add_argument('-i','--input', help='Profile a keystream file of 0s and 1s, such as stream.txt, instead of generating one', required=False)
+	args = vars(parser.parse_args())
+
+	stream_cipher = load_cipher()
+	states = stream_cipher.initial_states
+	if args['key']:
+		states = [int(state) for state in args['key'].split(',')]
+	if len(states) != len(stream_cipher.registers):
+		print ("The key must give an initial state for each of the " + str(len(stream_cipher.registers)) + " LFSRs")
+		sys.exit(1)
+
+	if args['input']:
+		with open(args['input'], 'r') as samples:
+			keystream = BitArray('bin=' + samples.read().replace(' ', '').strip())
+		args['number'] = min(args['number'], keystream.len)
+		keystream.append(BitArray(-keystream.len % 8))
+		chunks = [keystream.tobytes()]
+	else:
+		chunks = stream_cipher.keystream_chunks(states, chunk_bytes)
+
+	startTime = time.time()
+	algorithm = measure(chunks, args['number'], args['settle'])
+	taken = time.time() - startTime
+
+	print ("Linear complexity profile (bits seen: complexity):")
+	if args['profile']:
+		for position, complexity in algorithm.profile:
+			print (str(position) + ": " + str(complexity))
+	else:
+		position = 16
+		while position < algorithm.position:
+			print (str(position) + ": " + str(algorithm.complexity_at(position)))
+			position *= 2
+	print ("Linear complexity after " + str(algorithm.position) + " bits: " + str(algorithm.complexity))
+	print ("Last change at bit " + str(algorithm.change + 1) + ", unchanged for the " + str(algorithm.position - algorithm.change - 1) + " bits since")
+	if algorithm.stable(algorithm.complexity):
+		print ("The profile has stabilised")
+	else:
+		print ("The profile has not stabilised yet, more keystream is needed")
+	print ("Time taken (seconds): " + str(taken) + " (" + str(int(algorithm.position / max(taken, 1e-9))) + " bits per second)")
+
+	description = stream_cipher.description
+	expected, terms = theoretical(description)
+	print ("Linear complexity of each LFSR alone: " + ", ".join(register['name'] + " " + str(register['length']) for register in description['registers']))
+	print ("Theoretical linear complexity from the ANF of the combining function: " + " + ".join(name for name, product in terms) + " = " + " + ".join(str(product) for name, product in terms) + " = " + str(expected))
+	if algorithm.complexity == expected:
+		print ("The measured linear complexity matches the theoretical value")
+	else:
+		print ("The measured linear complexity differs from the theoretical value by " + str(algorithm.complexity - expected))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python2
+
+# Fast correlation scan scoring every initial state of an LFSR against a keystream with one Walsh-Hadamard transform
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# The output of an LFSR is linear in its initial state, so output bit n is the parity of s & a_n for a fixed L bit mask a_n,
+# where s is the initial state as an integer in the form used by lfsr.py. For a keystream z the sum over n of (-1)^(z_n + out_n)
+# is the number of agreements minus the number of disagreements. Grouping the terms by a_n turns it into
+#
+#   sum over a of f(a) (-1)^(a.s)    where f(a) = sum over n with a_n = a of (-1)^z_n
+#
+# which is the Walsh-Hadamard transform of f evaluated at s. One fast transform of the 2^L entries of f therefore scores every
+# initial state at once in O(L x 2^L) operations, instead of generating and comparing keybits of output for each of them.
+# That is what makes registers of 20 to 24 bits practical to attack.
+
+import sys
+import time
+import argparse
+import numpy
+from bitstring import BitArray
+import lfsr
+import packed
+
+
+# Function to turn the first clock_cycles bits of a BitArray into a NumPy array of 0s and 1s
+def unpack(bits, clock_cycles):
+	padded = bits[0:clock_cycles].tobytes()
+	return numpy.unpackbits(numpy.frombuffer(padded, dtype=numpy.uint8))[0:clock_cycles]
+
+
+# Function to work out the mask a_n for each of the first clock_cycles output bits of a register, so that output bit n from
+# initial state s is the parity of s & a_n. Bit i of a_n is output bit n when only bit i of the state is set.
+def output_masks(tap_sequence, length, clock_cycles):
+	engine = lfsr.engine(tap_sequence, length)
+	basis = numpy.left_shift(numpy.uint64(1), numpy.arange(length, dtype=numpy.uint64))
+	words = engine.output(basis, clock_cycles)
+	bits = numpy.unpackbits(words.astype('>u8').view(numpy.uint8), axis=1)[:, 0:clock_cycles]
+	masks = numpy.zeros(clock_cycles, dtype=numpy.int64)
+	for i in range(0, length):
+		masks |= bits[i].astype(numpy.int64) << i
+	return masks
+
+
+# Function to compute the Walsh-Hadamard transform of an array whose length is a power of 2, one butterfly stage at a time.
+# Each stage works in place on the copy, as the arrays for a 24 bit register are large. A 2D array is transformed along its
+# first axis, so each column is transformed separately.
+def walsh_hadamard(values):
+	values = numpy.array(values)
+	size = len(values)
+	half = 1
+	while half < size:
+		pairs = values.reshape((-1, 2, half) + values.shape[1:])
+		first = pairs[:, 0].copy()
+		pairs[:, 0] += pairs[:, 1]
+		numpy.subtract(first, pairs[:, 1], out=pairs[:, 1])
+		half *= 2
+	return values
+
+
+# Function to count, for every length bit state, how many of the first clock_cycles bits of the keystream agree with the parity
+# of the state and the mask for each bit. Returns an array indexed by state.
+def scan_masks(masks, length, keystream, clock_cycles):
+	bits = unpack(keystream, clock_cycles)
+	signs = numpy.bincount(masks[bits == 0], minlength=1 << length) - numpy.bincount(masks[bits == 1], minlength=1 << length)
+	return (clock_cycles + walsh_hadamard(signs.astype(numpy.int32))) // 2
+
+
+# Function to count, for every initial state of a register, how many of the first clock_cycles bits of its output agree with
+# the keystream. Returns an array indexed by initial state.
+def scan(tap_sequence, length, keystream, clock_cycles):
+	return scan_masks(output_masks(tap_sequence, length, clock_cycles), length, keystream, clock_cycles)
+
+
+# Function to rank initial states by how far their agreement is from half the bits, strongest correlation first, in either
+# direction, with ties broken by the lower state. Returns a list of (initial state, agreement) for the best count states, or
+# all of them. Only the best count states are sorted, which matters when there are millions of them.
+# The all zero state is left out. It only ever outputs zeros, so it simply mirrors the bias of the keystream itself.
+def ranked(agreements, clock_cycles, count=None):
+	deviations = numpy.abs(2 * agreements[1:].astype(numpy.int64) - clock_cycles)
+	states = numpy.arange(len(deviations))
+	if count is not None and count < len(deviations):
+		cutoff = -numpy.partition(-deviations, count - 1)[count - 1]
+		states = numpy.nonzero(deviations >= cutoff)[0]
+	order = states[numpy.lexsort((states, -deviations[states]))][0:count]
+	return [(int(state) + 1, int(agreements[state + 1])) for state in order]
+
+
+# Function to work out the log of the ratio between the likelihood of a number of agreements out of so many bits examined when
+# the agreement rate is target, and when it is a half
+def log_likelihood(agreements, examined, target):
+	return agreements * numpy.log(2.0 * target) + (examined - agreements) * numpy.log(2.0 * (1.0 - target))
+
+
+# Function to score candidate streams against a keystream with Wald's sequential probability ratio test, a 64 bit word at a time.
+# Each candidate is tested for agreeing with the keystream a fraction target of the time, against agreeing half the time. It
+# is dropped as soon as the log likelihood ratio falls to log(false_reject / (1 - false_accept)) and accepted as soon as it
+# reaches log((1 - false_reject) / false_accept). false_reject is the chance of dropping the right candidate and false_accept
+# the chance of accepting any one wrong candidate. Most wrong candidates are dropped after a few hundred bits.
+# candidates has one row of packed words from lfsr.py or packed.py per candidate and keystream is packed the same way.
+# Returns (agreements, examined, decisions) where examined is the number of bits compared for each candidate before it was
+# decided, and decisions is 1 for accepted, -1 for dropped and 0 for still undecided at the end of the keystream.
+def sequential(candidates, keystream, keybits, target, false_reject=0.001, false_accept=0.000001):
+	lower = numpy.log(false_reject / (1.0 - false_accept))
+	upper = numpy.log((1.0 - false_reject) / false_accept)
+
+	agreements = numpy.zeros(len(candidates), dtype=numpy.int64)
+	examined = numpy.zeros(len(candidates), dtype=numpy.int64)
+	decisions = numpy.zeros(len(candidates), dtype=numpy.int64)
+	active = numpy.arange(len(candidates))
+	for w in range(0, (keybits + packed.word_bits - 1) // packed.word_bits):
+		if not len(active):
+			break
+		bits = min(packed.word_bits, keybits - w * packed.word_bits)
+		agreements[active] += packed.agreement(candidates[active, w:w + 1], keystream[w:w + 1], bits)
+		examined[active] += bits
+		ratios = log_likelihood(agreements[active], examined[active], target)
+		decisions[active[ratios <= lower]] = -1
+		decisions[active[ratios >= upper]] = 1
+		active = active[(ratios > lower) & (ratios < upper)]
+	return agreements, examined, decisions
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Score every initial state of an LFSR against a keystream with a fast Walsh-Hadamard transform.')
+	parser.add_argument('-t','--taps', help='Comma separated tap sequence, eg 4,7', required=True)
+	parser.add_argument('-l','--length', help='Length of the register in bits, up to 24 or so depending on memory', type=int, required=True)
+	parser.add_argument('-i','--input', help='Keystream file of 0s and 1s to attack. Default is stream.txt.', default='stream.txt')
+	parser.add_argument('-n','--number', help='Number of candidate initial states to list. Default is 10.', type=int, default=10)
+	args = vars(parser.parse_args())
+
+	tap_sequence = [int(tap) for tap in args['taps'].split(',')]
+	if args['length'] < 1 or args['length'] > 32:
+		print ("Register length must be between 1 and 32 bits")
+		sys.exit(1)
+	if [tap for tap in tap_sequence if tap < 1 or tap > args['length']]:
+		print ("Taps must be between 1 and the length of the register")
+		sys.exit(1)
+
+	with open(args['input'], 'r') as samples:
+		keystream = BitArray('bin=' + samples.read().replace(' ', '').strip())
+
+	# Make a note of start time for calculating throughput
+	startTime = time.time()
+	agreements = scan(tap_sequence, args['length'], keystream, keystream.len)
+	endTime = time.time()
+	print ("Scored " + str(len(agreements)) + " initial states against " + str(keystream.len) + " bits in " + str(endTime - startTime) + " seconds")
+
+	for state, agreement in ranked(agreements, keystream.len, args['number']):
+		print ("Initial State: " + str(state) + " Counter: " + str(agreement))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python2
+
+# Word-parallel LFSR engine with jump-ahead, producing the same output as register() in stream-cipher.py
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# The state of an n bit register is kept in a plain integer whose least significant bit is the rightmost bit of the register,
+# ie bit n in the notation of the README, which is the bit that is output. Tap t is bit n - t of the integer. One clock outputs
+# the least significant bit, shifts right and puts the XOR of the tapped bits in at the top, exactly like register().
+#
+# Clocking is linear over GF(2), so the state after 64 clocks and the 64 bits output along the way are both linear functions of
+# the current state. They are precomputed for every value of every byte of the state, so 64 bits of output cost one table
+# lookup per byte of the register rather than 64 trips round a Python loop. The lookups work on NumPy arrays, so many initial
+# states can be clocked side by side. Output words hold the first bit in their most significant bit, the same order as BitArray.
+#
+# Jumping ahead d clocks multiplies the state by the d-th power of the companion matrix of the register, which takes
+# O(log d) matrix squarings. Matrices are held as lists of column integers.
+
+import numpy
+from bitstring import BitArray
+
+# Number of output bits in a word
+word_bits = 64
+
+
+# Function to multiply a state by a matrix given as a list of column integers
+def apply_matrix(columns, state):
+	result = 0
+	i = 0
+	while state:
+		if state & 1:
+			result ^= columns[i]
+		state >>= 1
+		i += 1
+	return result
+
+
+# Function to multiply two matrices given as lists of column integers. The result applies second and then first.
+def multiply(first, second):
+	return [apply_matrix(first, column) for column in second]
+
+
+# Function to turn a matrix given as a list of column integers into one lookup table per byte of the state, so that it can be
+# applied to a whole NumPy array of states with one lookup per byte
+def byte_tables(columns):
+	tables = []
+	for j in range(0, (len(columns) + 7) // 8):
+		table = [0] * 256
+		for byte in range(1, 256):
+			low = byte & -byte
+			bit = 8 * j + low.bit_length() - 1
+			table[byte] = table[byte ^ low] ^ (columns[bit] if bit < len(columns) else 0)
+		tables.append(numpy.array(table, dtype=numpy.uint64))
+	return tables
+
+
+class LFSR(object):
+
+	# tap_sequence is a list of bit positions counted from 1 on the left, as for register(). length is the size of the register.
+	def __init__(self, tap_sequence, length):
+		if length < 1 or length > 64:
+			raise ValueError("Register length must be between 1 and 64 bits, not " + str(length))
+		for tap in tap_sequence:
+			if tap < 1 or tap > length:
+				raise ValueError("Tap " + str(tap) + " is outside a " + str(length) + " bit register")
+
+		self.tap_sequence = list(tap_sequence)
+		self.length = length
+		self.tap_mask = 0
+		for tap in tap_sequence:
+			self.tap_mask ^= 1 << (length - tap)
+
+		# The companion matrix, and its powers by repeated squaring as they are needed for jumping ahead
+		self.companion = [self.clock(1 << i) for i in range(0, length)]
+		self.squares = [self.companion]
+
+		# For every state bit, the word of output and the state after one word of clocks, starting from just that bit set
+		outputs = []
+		states = []
+		for i in range(0, length):
+			state = 1 << i
+			word = 0
+			for cycle in range(0, word_bits):
+				word = (word << 1) | (state & 1)
+				state = self.clock(state)
+			outputs.append(word)
+			states.append(state)
+
+		# Combine them into one table per byte of the state
+		self.output_tables = byte_tables(outputs)
+		self.state_tables = byte_tables(states)
+		self.shifts = [numpy.uint64(8 * j) for j in range(0, len(self.output_tables))]
+
+		# Tables for leap(), by distance
+		self.leap_tables = {}
+
+	# Function to clock an integer state once and return the new state
+	def clock(self, state):
+		tapped = bin(state & self.tap_mask).count("1") & 1
+		return (state >> 1) | (tapped << (self.length - 1))
+
+	# Function to turn a BitArray holding the register, leftmost bit first, into an integer state
+	def state(self, initial_bits):
+		if initial_bits.len != self.length:
+			raise ValueError("Initial state must be " + str(self.length) + " bits, not " + str(initial_bits.len))
+		return initial_bits.uint
+
+	# Function to clock one or more states count x 64 times. states is an integer or a NumPy array of them.
+	# Returns (words, states) where words has one row of count output words per state and states are the states afterwards.
+	def words(self, states, count):
+		states = numpy.array(states, dtype=numpy.uint64)
+		words = numpy.zeros(states.shape + (count,), dtype=numpy.uint64)
+		byte_mask = numpy.uint64(0xff)
+		for w in range(0, count):
+			indexes = [(states >> shift) & byte_mask for shift in self.shifts]
+			word = self.output_tables[0][indexes[0]]
+			next_states = self.state_tables[0][indexes[0]]
+			for j in range(1, len(indexes)):
+				word ^= self.output_tables[j][indexes[j]]
+				next_states ^= self.state_tables[j][indexes[j]]
+			words[..., w] = word
+			states = next_states
+		return words, states
+
+	# Function to return the first clock_cycles output bits for one or more states as packed words, with any unused bits at
+	# the end of the last word set to zero
+	def output(self, states, clock_cycles):
+		words, states = self.words(states, (clock_cycles + word_bits - 1) // word_bits)
+		spare = -clock_cycles % word_bits
+		if spare and words.shape[-1]:
+			words[..., -1] &= ~numpy.uint64((1 << spare) - 1)
+		return words
+
+	# Function to jump an integer state ahead by any number of clocks
+	def jump(self, state, distance):
+		k = 0
+		while distance:
+			if k == len(self.squares):
+				self.squares.append(multiply(self.squares[-1], self.squares[-1]))
+			if distance & 1:
+				state = apply_matrix(self.squares[k], state)
+			distance >>= 1
+			k += 1
+		return state
+
+	# Function to jump one or more states, an integer or a NumPy array of them, ahead by the same number of clocks. The jump
+	# matrix is turned into byte tables the first time each distance is used, so every state costs one lookup per byte.
+	def leap(self, states, distance):
+		if distance not in self.leap_tables:
+			self.leap_tables[distance] = byte_tables([self.jump(1 << i, distance) for i in range(0, self.length)])
+		states = numpy.array(states, dtype=numpy.uint64)
+		byte_mask = numpy.uint64(0xff)
+		result = self.leap_tables[distance][0][states & byte_mask]
+		for j in range(1, len(self.shifts)):
+			result ^= self.leap_tables[distance][j][(states >> self.shifts[j]) & byte_mask]
+		return result
+
+	# Function to return the output bits for one state as a BitArray, the same as register() would
+	def bits(self, state, clock_cycles):
+		words = self.output(state, clock_cycles)
+		return BitArray(bytes=words.astype('>u8').tobytes(), length=clock_cycles)
+
+
+# Engines already built for each register, as building the tables is the expensive part
+engines = {}
+
+
+# Function to return the engine for a tap sequence and register length, building it the first time
+def engine(tap_sequence, length):
+	key = (tuple(tap_sequence), length)
+	if key not in engines:
+		engines[key] = LFSR(tap_sequence, length)
+	return engines[key]
+
+
+# Drop in replacement for register() in stream-cipher.py, returning a BitArray of the same output bits. Unlike register() it
+# leaves initial_bits unchanged.
+def register(tap_sequence, initial_bits, clock_cycles):
+	lfsr = engine(tap_sequence, initial_bits.len)
+	return lfsr.bits(lfsr.state(initial_bits), clock_cycles)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python2
+
+# Index of one full period of an LFSR's m-sequence, so that every initial state becomes an offset into the same sequence
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# When the tap sequence of an L bit register is primitive, which is what the README means by the LFSRs having maximal periods,
+# the register steps through all 2^L - 1 nonzero states before repeating. The output from any nonzero initial state is then
+# just the single m-sequence of period 2^L - 1 started at some offset. Rather than generating keybits of output for every
+# candidate initial state, the index stores one full period of output and a table from each state to its offset, so the
+# output of a candidate is a window of the sequence.
+#
+# Because output bit j of a state is bit j of the state for j < L, the state at offset k is simply bits k to k + L - 1 of the
+# sequence read as an integer, which lets the whole offset table be built with array operations. The agreement of every
+# offset with a keystream at once is a cross-correlation, done with an FFT.
+#
+# Indexes for registers of cached_length bits or more are written to disk the first time they are built and memory-mapped after
+# that, as the offset table of a 24 bit register is 64MB. Smaller ones are quicker to rebuild than to load.
+
+import os
+import sys
+import time
+import argparse
+import numpy
+from bitstring import BitArray
+import lfsr
+import correlation
+
+# Default directory for the cached indexes, next to this script
+cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'msequence-cache')
+
+# Registers of at least this many bits have their index cached on disk
+cached_length = 16
+
+# Number of bits generated for each block of the sequence while building an index
+block_bits = 4096
+
+# Smallest FFT used when cross-correlating the sequence with a keystream
+fft_size = 1 << 16
+
+
+# Function to list the prime factors of a number by trial division
+def prime_factors(number):
+	factors = []
+	factor = 2
+	while factor * factor <= number:
+		if number % factor == 0:
+			factors.append(factor)
+			while number % factor == 0:
+				number //= factor
+		factor += 1
+	if number > 1:
+		factors.append(number)
+	return factors
+
+
+# Function to check that a register has the maximal period of 2^L - 1. The order of any nonzero state divides the period, so it
+# is maximal if jumping ahead by the period gets back to the start and jumping by the period over any prime factor does not.
+def is_maximal(tap_sequence, length):
+	engine = lfsr.engine(tap_sequence, length)
+	period = (1 << length) - 1
+	if engine.jump(1, period) != 1:
+		return False
+	return all(engine.jump(1, period // factor) != 1 for factor in prime_factors(period) if factor != period)
+
+
+class Index(object):
+
+	# sequence holds one period of output as an array of 0s and 1s starting from the state 1, and offsets maps each state to
+	# where its output starts in the sequence. The all zero state has no offset and is mapped to the period.
+	def __init__(self, tap_sequence, length, sequence, offsets):
+		self.tap_sequence = list(tap_sequence)
+		self.length = length
+		self.period = (1 << length) - 1
+		self.sequence = sequence
+		self.offsets = offsets
+
+	# Function to return the first clock_cycles output bits from an initial state as an array of 0s and 1s
+	def window(self, state, clock_cycles):
+		if state == 0:
+			return numpy.zeros(clock_cycles, dtype=numpy.uint8)
+		positions = (int(self.offsets[state]) + numpy.arange(clock_cycles)) % self.period
+		return numpy.asarray(self.sequence[positions], dtype=numpy.uint8)
+
+	# Function to return the first clock_cycles output bits from an initial state as a BitArray, the same as lfsr.register()
+	def bits(self, state, clock_cycles):
+		return BitArray(bytes=numpy.packbits(self.window(state, clock_cycles)).tobytes(), length=clock_cycles)
+
+	# Function to count, for every offset into the sequence, how many of the first clock_cycles bits from that offset agree with
+	# the keystream. keystream is an array of 0s and 1s. The sums of +1 and -1 are a cross-correlation, done with FFTs a block of
+	# offsets at a time so that the memory used stays small however long the period is, and padded to a power of 2 so that the
+	# length of the period, which is often prime, does not matter.
+	def correlate(self, keystream, clock_cycles):
+		keystream = 1 - 2 * numpy.asarray(keystream[0:clock_cycles], dtype=numpy.float64)
+		size = fft_size
+		while size < 2 * clock_cycles:
+			size *= 2
+		step = size - clock_cycles + 1
+		pattern = numpy.conj(numpy.fft.rfft(keystream, size))
+		sums = numpy.zeros(self.period, dtype=numpy.int64)
+		for start in range(0, self.period, step):
+			count = min(step, self.period - start)
+			segment = self.sequence[numpy.arange(start, start + count + clock_cycles - 1) % self.period]
+			segment = 1 - 2 * numpy.asarray(segment, dtype=numpy.float64)
+			sums[start:start + count] = numpy.rint(numpy.fft.irfft(numpy.fft.rfft(segment, size) * pattern, size)[0:count])
+		return (clock_cycles + sums) // 2
+
+	# Function to count, for every initial state, how many of the first clock_cycles output bits agree with a BitArray keystream.
+	# Returns an array indexed by initial state, like correlation.scan().
+	def scan(self, keystream, clock_cycles):
+		bits = numpy.unpackbits(numpy.frombuffer(keystream[0:clock_cycles].tobytes(), dtype=numpy.uint8))[0:clock_cycles]
+		by_offset = numpy.append(self.correlate(bits, clock_cycles), clock_cycles - int(bits.sum()))
+		return by_offset[self.offsets]
+
+
+# Function to build the index of a register in memory
+def build(tap_sequence, length):
+	if not is_maximal(tap_sequence, length):
+		raise ValueError("Taps " + str(tap_sequence) + " do not give a " + str(length) + " bit register a maximal period")
+	engine = lfsr.engine(tap_sequence, length)
+	period = (1 << length) - 1
+
+	# Generate the sequence a block at a time from the states at the start of every block, found by jumping ahead, with all the
+	# blocks clocked side by side. The extra length - 1 bits let the states near the end of the period be read straight off.
+	starts = (period + length - 1 + block_bits - 1) // block_bits
+	states = [1]
+	for block in range(1, starts):
+		states.append(engine.jump(states[-1], block_bits))
+	words = engine.output(numpy.array(states, dtype=numpy.uint64), block_bits)
+	sequence = numpy.unpackbits(words.astype('>u8').view(numpy.uint8), axis=1).ravel()[0:period + length - 1]
+
+	# Read the state at every offset from the sequence and invert the mapping
+	states = numpy.zeros(period, dtype=numpy.int64)
+	for bit in range(0, length):
+		states |= sequence[bit:bit + period].astype(numpy.int64) << bit
+	offsets = numpy.zeros(period + 1, dtype=numpy.uint32)
+	offsets[0] = period
+	offsets[states] = numpy.arange(period, dtype=numpy.uint32)
+	return Index(tap_sequence, length, sequence[0:period], offsets)
+
+
+# Function to save an array to a .npy file under a temporary name and then rename it, so that an interrupted build never leaves
+# a partial file in the cache
+def save(filename, array):
+	with open(filename + ".tmp", 'wb') as outfile:
+		numpy.save(outfile, array)
+	os.rename(filename + ".tmp", filename)
+
+
+# Indexes already loaded or built
+indexes = {}
+
+
+# Function to return the index of a register. Registers of cached_length bits or more are loaded from the cache directory,
+# memory-mapped, and are built and saved there first if they are not already present.
+def index(tap_sequence, length, directory=cache_directory):
+	key = (tuple(tap_sequence), length)
+	if key in indexes:
+		return indexes[key]
+	if length < cached_length:
+		indexes[key] = build(tap_sequence, length)
+		return indexes[key]
+
+	name = os.path.join(directory, "taps-" + "-".join(str(tap) for tap in tap_sequence) + "-length-" + str(length))
+	if not os.path.exists(name + "-offsets.npy"):
+		built = build(tap_sequence, length)
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		save(name + "-sequence.npy", built.sequence)
+		save(name + "-offsets.npy", built.offsets)
+	indexes[key] = Index(tap_sequence, length, numpy.load(name + "-sequence.npy", mmap_mode='r'), numpy.load(name + "-offsets.npy", mmap_mode='r'))
+	return indexes[key]
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Build the m-sequence index of an LFSR and score every initial state against a keystream with one cross-correlation.')
+	parser.add_argument('-t','--taps', help='Comma separated tap sequence, eg 4,7', required=True)
+	parser.add_argument('-l','--length', help='Length of the register in bits', type=int, required=True)
+	parser.add_argument('-i','--input', help='Keystream file of 0s and 1s to attack. Default is stream.txt.', default='stream.txt')
+	parser.add_argument('-n','--number', help='Number of candidate initial states to list. Default is 10.', type=int, default=10)
+	parser.add_argument('-c','--cache', help='Directory to cache indexes in. Default is msequence-cache next to this script.', default=cache_directory)
+	args = vars(parser.parse_args())
+
+	tap_sequence = [int(tap) for tap in args['taps'].split(',')]
+	if args['length'] < 1 or args['length'] > 32:
+		print ("Register length must be between 1 and 32 bits")
+		sys.exit(1)
+	if [tap for tap in tap_sequence if tap < 1 or tap > args['length']]:
+		print ("Taps must be between 1 and the length of the register")
+		sys.exit(1)
+
+	with open(args['input'], 'r') as samples:
+		keystream = BitArray('bin=' + samples.read().replace(' ', '').strip())
+
+	startTime = time.time()
+	try:
+		register_index = index(tap_sequence, args['length'], args['cache'])
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+	print ("Index of period " + str(register_index.period) + " ready in " + str(time.time() - startTime) + " seconds")
+
+	startTime = time.time()
+	agreements = register_index.scan(keystream, keystream.len)
+	print ("Scored " + str(len(agreements)) + " initial states against " + str(keystream.len) + " bits in " + str(time.time() - startTime) + " seconds")
+
+	# Rank them the same way as the Walsh-Hadamard scan
+	for state, agreement in correlation.ranked(agreements, keystream.len, args['number']):
+		print ("Initial State: " + str(state) + " Counter: " + str(agreement))
@@ -0,0 +1,278 @@
+#!/usr/bin/env python2
+
+# Runs the register attacks of a divide and conquer plan in parallel, sharding each search across a pool of worker processes
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# siegenthaler.py runs its phases one after the other, but the attacks on LFSR1 and LFSR3 do not depend on each other, and only
+# the attack on LFSR4 needs LFSR1, and only the brute force of LFSR2 needs all three. Here every step of a plan, either the one
+# used by siegenthaler.py or one from the planner in combiner.py, is split into shards of candidate initial states. A step is
+# scheduled on the pool as soon as the registers it depends on have been recovered, so independent steps run side by side.
+#
+# The packed keystream is put in shared memory once, when the pool starts, rather than being sent with every shard. Each shard
+# scores its candidates with the sequential test in correlation.py, or matches them exactly for a brute force step. As soon as
+# one shard accepts a candidate, a shared flag for its step is set, and every remaining shard of that step checks the flag and
+# returns without doing any work. If no shard accepts a candidate the best undecided one over the whole step is taken.
+
+import sys
+import time
+import ctypes
+import argparse
+import traceback
+import multiprocessing
+import numpy
+from bitstring import BitArray
+import packed
+import correlation
+import combiner
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+# Default number of candidate initial states in each shard
+shard_size = 4096
+
+# Default chance of the sequential test accepting any one wrong candidate. Small, as the first acceptance ends the step.
+false_accept = 0.000000001
+
+# Worker process state, set up by initialise() when the pool starts
+worker = {}
+
+
+# Function to describe the plan followed by siegenthaler.py for a cipher of four registers, with the agreement rates taken from
+# the Walsh spectrum of its combining function: LFSR1 and LFSR3 by first order correlation, LFSR4 by the correlation of LFSR1
+# XOR LFSR4 and LFSR2 by brute force. Masks have bit i set for register i, as in combiner.py.
+def siegenthaler_plan(description):
+	spectrum = combiner.walsh_spectrum(description['combining_function'])
+	steps = []
+	for mask, guessed in [(1, 1), (4, 4), (9, 8)]:
+		agreement = 0.5 + spectrum[combiner.input_mask(mask, 4)] / 32.0
+		steps.append({'kind': 'correlation', 'mask': mask, 'guessed': guessed, 'agreement': agreement})
+	steps.append({'kind': 'brute force', 'mask': 15, 'guessed': 2, 'agreement': 1.0})
+	for step in steps:
+		bits = sum(description['registers'][i]['length'] for i in combiner.members(step['guessed'], 4))
+		step['candidates'] = 2 ** bits
+		step['keystream'] = combiner.keystream_needed(bits, step['agreement'])
+	return steps
+
+
+# Function run in each worker process when the pool starts, to attach the shared keystream and cancellation flags
+def initialise(keystream_buffer, cancel_flags, description, keybits, false_reject):
+	worker['keystream'] = numpy.frombuffer(keystream_buffer, dtype=numpy.uint64)
+	worker['cancelled'] = cancel_flags
+	worker['description'] = description
+	worker['keybits'] = keybits
+	worker['false_reject'] = false_reject
+
+
+# Function run in a worker for each shard. The pool has no way to report an exception raised in a worker back through the
+# callback, so any exception is caught and returned as its formatted traceback, to be raised again by the driver.
+# Returns the result of search_shard() followed by None, or (step number, start, None, None, 0, 0, traceback).
+def run_shard(task):
+	try:
+		return search_shard(task) + (None,)
+	except Exception:
+		return task[0], task[2], None, None, 0, 0, traceback.format_exc()
+
+
+# Function run in a worker to search one shard of the candidate joint states of a step.
+# Returns (step number, start, found, fallback, bits examined, candidates examined) where found is an accepted or matching
+# joint state or None, and fallback is (log likelihood ratio, joint state) for the best undecided candidate or None.
+def search_shard(task):
+	number, step, start, end, known = task
+	description = worker['description']
+	keybits = worker['keybits']
+	count = len(description['registers'])
+	if worker['cancelled'][number]:
+		return number, start, None, None, 0, 0
+
+	indexes = combiner.members(step['guessed'], count)
+	known_outputs = combiner.outputs(description, known, keybits)
+	joints = numpy.arange(start, end, dtype=numpy.uint64)
+
+	# A register left all zero outputs nothing but zeros, which only mirrors the bias of the keystream, so as in
+	# correlation.ranked() those candidates are left out of correlation steps
+	if step['kind'] != 'brute force':
+		shift = 0
+		for i in reversed(indexes):
+			length = description['registers'][i]['length']
+			joints = joints[(joints >> numpy.uint64(shift)) & numpy.uint64((1 << length) - 1) != 0]
+			shift += length
+		if not len(joints):
+			return number, start, None, None, 0, 0
+
+	streams = combiner.register_outputs(description, indexes, joints, keybits)
+
+	if step['kind'] == 'brute force':
+		streams.update(known_outputs)
+		keystreams = packed.combine(description['combining_function'], [streams[i] for i in range(0, count)])
+		matches = numpy.nonzero(packed.agreement(keystreams, worker['keystream'], keybits) == keybits)[0]
+		found = int(joints[matches[0]]) if len(matches) else None
+		return number, start, found, None, keybits * len(joints), len(joints)
+
+	# XOR the output of the known registers in the mask into the keystream and the guessed ones together
+	target = worker['keystream'].copy()
+	for i in combiner.members(step['mask'] & ~step['guessed'], count):
+		target ^= known_outputs[i]
+	candidates = streams[indexes[0]]
+	for i in indexes[1:]:
+		candidates = candidates ^ streams[i]
+
+	agreements, examined, decisions = correlation.sequential(candidates, target, keybits, step['agreement'], worker['false_reject'], false_accept)
+	ratios = correlation.log_likelihood(agreements, examined, step['agreement'])
+	found = None
+	accepted = numpy.nonzero(decisions == 1)[0]
+	if len(accepted):
+		found = int(joints[accepted[numpy.argmax(ratios[accepted])]])
+	fallback = None
+	undecided = numpy.nonzero(decisions == 0)[0]
+	if len(undecided):
+		best = undecided[numpy.argmax(ratios[undecided])]
+		fallback = (float(ratios[best]), int(joints[best]))
+	return number, start, found, fallback, int(examined.sum()), len(joints)
+
+
+# Function to run a plan against a keystream on a pool of worker processes. Returns the initial state of every register, by index.
+def attack(description, steps, keystream, keybits, workers=None, size=shard_size, false_reject=0.001, verbose=False):
+	count = len(description['registers'])
+	words = packed.pack(keystream, keybits)
+	keystream_buffer = multiprocessing.RawArray(ctypes.c_uint64, len(words))
+	numpy.frombuffer(keystream_buffer, dtype=numpy.uint64)[:] = words
+	cancel_flags = multiprocessing.RawArray(ctypes.c_byte, len(steps))
+	pool = multiprocessing.Pool(workers, initialise, (keystream_buffer, cancel_flags, description, keybits, false_reject))
+
+	# Results come back through a queue filled by the pool's callbacks
+	results = queue.Queue()
+	known = {}
+	started = set()
+	resolved = set()
+	pending = {}
+	fallbacks = {}
+	totals = {}
+	startTimes = {}
+
+	# Function to schedule every step whose prerequisites are now known
+	def schedule():
+		for number, step in enumerate(steps):
+			needed = combiner.members(step['mask'] & ~step['guessed'], count)
+			if number in started or [i for i in needed if i not in known]:
+				continue
+			started.add(number)
+			startTimes[number] = time.time()
+			prerequisites = dict((i, known[i]) for i in needed)
+			shards = range(0, step['candidates'], size)
+			pending[number] = len(shards)
+			fallbacks[number] = None
+			totals[number] = [0, 0, len(shards), 0]
+			if verbose:
+				print ("Starting " + combiner.describe(description, step) + " in " + str(len(shards)) + " shards")
+			for start in shards:
+				task = (number, step, start, min(start + size, step['candidates']), prerequisites)
+				pool.apply_async(run_shard, (task,), callback=results.put)
+
+	# Function to record the answer to a step, cancel its remaining shards and schedule whatever it unblocks
+	def resolve(number, joint):
+		cancel_flags[number] = 1
+		resolved.add(number)
+		found = combiner.split(description, combiner.members(steps[number]['guessed'], count), joint)
+		known.update(found)
+		if verbose:
+			for i in sorted(found):
+				print ("Recovered " + description['registers'][i]['name'] + " initial state: " + str(found[i]) + " after " + str(time.time() - startTimes[number]) + " seconds")
+		schedule()
+
+	try:
+		schedule()
+		while len(resolved) < len(steps):
+
+			# Every step left waits on a register that no step still running will recover, so the plan cannot finish
+			if not [number for number in started if number not in resolved]:
+				waiting = [number for number in range(0, len(steps)) if number not in started]
+				raise ValueError("No step recovers the registers needed by " + ", ".join(combiner.describe(description, steps[number]) for number in waiting))
+
+			# Wait a second at a time, as a get() without a timeout cannot be interrupted with Ctrl-C on Python 2
+			try:
+				number, start, found, fallback, examined, candidates, error = results.get(timeout=1)
+			except queue.Empty:
+				continue
+			if error is not None:
+				raise RuntimeError("A worker failed on a shard of " + combiner.describe(description, steps[number]) + ":\n" + error)
+			pending[number] -= 1
+			totals[number][0] += examined
+			totals[number][1] += candidates
+			if candidates:
+				totals[number][3] += 1
+			if number in resolved:
+				continue
+			if found is not None:
+				resolve(number, found)
+			else:
+				if fallback is not None and (fallbacks[number] is None or fallback > fallbacks[number]):
+					fallbacks[number] = fallback
+				if not pending[number]:
+					if fallbacks[number] is None:
+						raise ValueError("No candidate survived for " + combiner.describe(description, steps[number]))
+					resolve(number, fallbacks[number][1])
+	finally:
+		pool.terminate()
+		pool.join()
+
+	if verbose:
+		for number in range(0, len(steps)):
+			examined, candidates, shards, run = totals[number]
+			average = float(examined) / candidates if candidates else 0
+			guessed = ", ".join(description['registers'][i]['name'] for i in combiner.members(steps[number]['guessed'], count))
+			print ("Step " + str(number + 1) + " (" + guessed + "): " + str(candidates) + " candidates examined, average " + str(average) + " bits each, " + str(shards - run) + " of " + str(shards) + " shards cancelled")
+	return known
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Run the steps of a divide and conquer correlation attack in parallel on a pool of worker processes.')
+	parser.add_argument('-d','--description', help='JSON description of the cipher. Default is stream-cipher.json.', default='stream-cipher.json')
+	parser.add_argument('-i','--input', help='Keystream file of 0s and 1s to attack. Default is stream.txt.', default='stream.txt')
+	parser.add_argument('-a','--auto', help='Use the plan from combiner.py rather than the one from siegenthaler.py.', action='store_true')
+	parser.add_argument('-w','--workers', help='Number of worker processes. Default is one per core.', type=int, required=False)
+	parser.add_argument('-s','--shard', help='Number of candidate initial states in each shard. Default is ' + str(shard_size) + '.', type=int, default=shard_size)
+	parser.add_argument('-r','--reject', help='Probability of the sequential test wrongly rejecting the correct initial state. Default is 0.001.', type=float, default=0.001)
+	args = vars(parser.parse_args())
+
+	if args['shard'] < 1:
+		print ("Shards must hold at least one candidate")
+		sys.exit(1)
+	if args['reject'] <= 0 or args['reject'] >= 1:
+		print ("The false reject probability must be between 0 and 1")
+		sys.exit(1)
+
+	with open(args['input'], 'r') as samples:
+		sample_keystream = BitArray('bin=' + samples.read().replace(' ', '').strip())
+	keybits = sample_keystream.len
+
+	try:
+		description = combiner.load(args['description'])
+		if args['auto']:
+			steps = combiner.plan(description, keybits)
+		elif len(description['registers']) == 4:
+			steps = siegenthaler_plan(description)
+		else:
+			print ("The plan from siegenthaler.py needs four registers, use -a for any other cipher")
+			sys.exit(1)
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+
+	startTime = time.time()
+	try:
+		states = attack(description, steps, sample_keystream, keybits, args['workers'], args['shard'], args['reject'], verbose=True)
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+	print ("Time taken (seconds): " + str(time.time() - startTime))
+
+	if combiner.keystream(description, states, keybits) == sample_keystream:
+		print ("The recovered initial states reproduce the keystream")
+	else:
+		print ("The recovered initial states do not reproduce the keystream")
+		sys.exit(1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python2
+
+# Packed bit vectors for scoring keystreams: XOR and popcount over 64 bit words instead of one bit at a time
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# A stream of bits is packed into NumPy uint64 words with the first bit in the most significant bit of the first word, the same
+# layout lfsr.py produces, and any unused bits at the end of the last word are zero. Two streams agree in a bit wherever their
+# XOR is 0, so the number of agreements is the number of bits minus the popcount of the XOR. Popcounts are done a byte at a time
+# with a lookup table, as this version of NumPy has no popcount of its own.
+#
+# Everything broadcasts over leading axes, so a whole array of candidate streams, one per row, can be scored against a single
+# keystream in one call. Python integers holding exactly keybits bits, the first bit most significant, are accepted too.
+
+import numpy
+from bitstring import BitArray
+
+# Number of bits in a word
+word_bits = 64
+
+# Number of bits set in each possible byte
+byte_popcounts = numpy.array([bin(byte).count("1") for byte in range(0, 256)], dtype=numpy.int64)
+
+
+# Function to pack the first keybits bits of a BitArray into an array of words
+def pack(bits, keybits):
+	words = (keybits + word_bits - 1) // word_bits
+	padded = bits[0:keybits].tobytes()
+	padded += b'\x00' * (8 * words - len(padded))
+	return numpy.frombuffer(padded, dtype='>u8').astype(numpy.uint64)
+
+
+# Function to unpack the first keybits bits of an array of words back into a BitArray
+def unpack(words, keybits):
+	return BitArray(bytes=numpy.asarray(words, dtype=numpy.uint64).astype('>u8').tobytes(), length=keybits)
+
+
+# Function to count the bits set in each row of words, summing along the last axis
+def popcount(words):
+	words = numpy.ascontiguousarray(words, dtype=numpy.uint64)
+	octets = words.view(numpy.uint8).reshape(words.shape[:-1] + (-1,))
+	return byte_popcounts[octets].sum(axis=-1)
+
+
+# Function to count how many of the first keybits bits of two packed streams agree. Either or both may be arrays with several
+# streams in their leading axes, in which case an array of counts is returned. Two Python integers give a Python integer.
+# Bits after the first keybits are ignored, so streams with junk in the unused bits of their last word can be compared.
+def agreement(stream_a, stream_b, keybits):
+	if not isinstance(stream_a, numpy.ndarray) and not isinstance(stream_b, numpy.ndarray):
+		return keybits - bin((int(stream_a) ^ int(stream_b)) & ((1 << keybits) - 1)).count("1")
+	words = (keybits + word_bits - 1) // word_bits
+	difference = numpy.bitwise_xor(stream_a, stream_b)[..., 0:words]
+	spare = -keybits % word_bits
+	if spare and words:
+		difference[..., -1] &= ~numpy.uint64((1 << spare) - 1)
+	return keybits - popcount(difference)
+
+
+# Function to apply a boolean function, given as a truth table like boolean_outputs, to packed input streams a whole word at a
+# time. inputs holds the streams for each input bit of the truth table index, most significant first. For every index whose
+# output is 1 the matching inputs or their complements are ANDed together, and those terms are ORed into the result.
+def combine(truth_table, inputs):
+	inputs = [numpy.asarray(stream, dtype=numpy.uint64) for stream in inputs]
+	result = numpy.zeros(numpy.broadcast(*inputs).shape, dtype=numpy.uint64)
+	for index in range(0, len(truth_table)):
+		if not truth_table[index]:
+			continue
+		term = ~numpy.zeros_like(result)
+		for position, stream in enumerate(inputs):
+			if (index >> (len(inputs) - 1 - position)) & 1:
+				term &= stream
+			else:
+				term &= ~stream
+		result |= term
+	return result
@@ -0,0 +1,297 @@
+#!/usr/bin/env python2
+
+# Battery of statistical tests for the keystream, run over packed bits a block at a time
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# The tests are the five basic tests from the Handbook of Applied Cryptography [6]: frequency, serial, poker, runs and
+# autocorrelation at several lags, plus the block frequency test from NIST SP 800-22 [7], whose form of the serial test is used.
+# On top of those the keystream is tested for agreement with the output of each LFSR and with the XOR of every pair of them,
+# which is what the correlation attack exploits.
+#
+# The keystream is generated and tested a block at a time, so the memory used does not depend on its length. Every count a test
+# needs comes from XORs, ANDs and popcounts of whole 64 bit words from packed.py. Each test gives a p-value for every block, and
+# an overall p-value from its counts summed over all the blocks. Pairs of bits that straddle two blocks are left out of the
+# serial, runs and autocorrelation tests. A p-value below the significance level, 0.01 by default, is a failure.
+
+import sys
+import math
+import time
+import argparse
+import itertools
+import numpy
+import packed
+import complexity
+
+# Number of bits of keystream tested by default
+test_bits = 1 << 24
+
+# Number of bits in each block
+block_bits = 1 << 20
+
+# Number of bits in each sub-block of the block frequency test, a multiple of the word size
+sub_block_bits = 128
+
+# Lags tested for autocorrelation by default
+default_lags = [1, 2, 3, 4, 5, 8, 16, 32, 64, 100, 1000]
+
+# Significance level below which a p-value counts as a failure
+significance = 0.01
+
+
+# Function to compute the regularised upper incomplete gamma function Q(a, x), the survival function of a chi-square statistic x
+# with 2a degrees of freedom at 2x, with a series for small x and a continued fraction otherwise
+def igamc(a, x):
+	if x <= 0:
+		return 1.0
+	scale = math.exp(-x + a * math.log(x) - math.lgamma(a))
+	if x < a + 1:
+		term = total = 1.0 / a
+		n = a
+		while abs(term) > abs(total) * 1e-15:
+			n += 1
+			term *= x / n
+			total += term
+		return max(0.0, 1.0 - total * scale)
+	tiny = 1e-300
+	b = x + 1 - a
+	c = 1.0 / tiny
+	d = 1.0 / b
+	h = d
+	for i in range(1, 1000):
+		an = -i * (i - a)
+		b += 2
+		d = an * d + b
+		d = tiny if abs(d) < tiny else d
+		c = b + an / c
+		c = tiny if abs(c) < tiny else c
+		d = 1.0 / d
+		delta = d * c
+		h *= delta
+		if abs(delta - 1) < 1e-15:
+			break
+	return scale * h
+
+
+# Function to turn a chi-square statistic into a p-value
+def chi_square(statistic, degrees):
+	return igamc(degrees / 2.0, statistic / 2.0)
+
+
+# Function to turn a statistic with a standard normal distribution into a two sided p-value
+def normal(statistic):
+	return math.erfc(abs(statistic) / math.sqrt(2))
+
+
+# Function to zero the bits of packed words after the first bits
+def trim(words, bits):
+	words = numpy.array(words, dtype=numpy.uint64)
+	full = bits // packed.word_bits
+	if full < len(words):
+		spare = packed.word_bits - bits % packed.word_bits
+		words[full] &= ~numpy.uint64((1 << spare) - 1) if spare < packed.word_bits else numpy.uint64(0)
+		words[full + 1:] = 0
+	return words
+
+
+# Function to delay a packed stream by lag bits, so that bit i of the result is bit i - lag of the stream and the first lag bits
+# are 0
+def delay(words, lag):
+	shift, offset = divmod(lag, packed.word_bits)
+	moved = numpy.zeros_like(words)
+	moved[shift:] = words[0:len(words) - shift]
+	if not offset:
+		return moved
+	carried = numpy.zeros_like(words)
+	carried[1:] = moved[0:-1] << numpy.uint64(packed.word_bits - offset)
+	return (moved >> numpy.uint64(offset)) | carried
+
+
+# Function to count the bits set in packed words at or after bit start
+def count_from(words, start):
+	words = numpy.array(words, dtype=numpy.uint64)
+	full = start // packed.word_bits
+	words[0:full] = 0
+	if start % packed.word_bits and full < len(words):
+		words[full] &= numpy.uint64((1 << (packed.word_bits - start % packed.word_bits)) - 1)
+	return int(packed.popcount(words))
+
+
+class Battery(object):
+
+	# lags are the lags for the autocorrelation test and names the names of the registers, if their outputs will be given
+	def __init__(self, lags=default_lags, names=None):
+		self.lags = list(lags)
+		self.names = list(names or [])
+		self.pairs = list(itertools.combinations(range(0, len(self.names)), 2))
+		self.bits = 0
+		self.ones = 0
+		self.chi_blocks = 0.0
+		self.sub_blocks = 0
+		self.serial_pairs = 0
+		self.serial = numpy.zeros(4, dtype=numpy.int64)
+		self.nibbles = numpy.zeros(16, dtype=numpy.int64)
+		self.transitions = 0
+		self.agreements = dict((lag, [0, 0]) for lag in self.lags)
+		self.registers = [0] * len(self.names)
+		self.combined = [0] * len(self.pairs)
+
+	# Function to list the names of the tests in the order their p-values are returned
+	def tests(self):
+		names = ["frequency", "block frequency", "serial", "poker", "runs"]
+		names += ["autocorrelation " + str(lag) for lag in self.lags]
+		names += [name for name in self.names]
+		names += [self.names[i] + " XOR " + self.names[j] for i, j in self.pairs]
+		return names
+
+	# Function to work out the p-value of every test from the counts for some number of bits
+	def p_values(self, bits, ones, chi_blocks, sub_blocks, serial, serial_pairs, nibbles, transitions, agreements, registers, combined):
+		values = [normal((2.0 * ones - bits) / math.sqrt(bits))]
+		values.append(chi_square(chi_blocks, sub_blocks) if sub_blocks else 1.0)
+
+		# Serial test on overlapping pairs of bits, in the form of NIST's second difference of psi squared, with the counts of single
+		# bits taken from the first bit of each pair so that both come from the same pairs
+		first = numpy.array([serial[0] + serial[1], serial[2] + serial[3]], dtype=numpy.float64)
+		statistic = 4.0 / serial_pairs * float((serial.astype(numpy.float64) ** 2).sum()) - 2.0 / serial_pairs * float((first ** 2).sum())
+		values.append(chi_square(statistic, 2))
+
+		# Poker test on 4 bit nibbles
+		hands = nibbles.sum()
+		values.append(chi_square(16.0 / hands * float((nibbles ** 2).sum()) - hands, 15) if hands else 1.0)
+
+		# Runs test, failed outright if the frequency test is badly failed as the expected number of runs is then meaningless
+		proportion = float(ones) / bits
+		spread = proportion * (1 - proportion)
+		if abs(proportion - 0.5) >= 2.0 / math.sqrt(bits) or not spread:
+			values.append(0.0)
+		else:
+			values.append(math.erfc(abs(transitions - 2.0 * serial_pairs * spread) / (2 * math.sqrt(2.0 * serial_pairs) * spread)))
+
+		# Autocorrelation and correlation with the LFSRs all count agreements, which are binomial with half the bits
+		for lag in self.lags:
+			agreed, compared = agreements[lag]
+			values.append(normal((2.0 * agreed - compared) / math.sqrt(compared)) if compared else 1.0)
+		for agreed in list(registers) + list(combined):
+			values.append(normal((2.0 * agreed - bits) / math.sqrt(bits)))
+		return values
+
+	# Function to test the next block of keystream, given as packed words holding bits bits, along with the output of each LFSR
+	# for the same bits if the names of the registers were given. Returns the p-value of every test for this block.
+	def update(self, words, bits, outputs=None):
+		words = trim(words, bits)
+		ones = int(packed.popcount(words))
+
+		# Block frequency over whole sub-blocks
+		sub_words = sub_block_bits // packed.word_bits
+		sub_blocks = bits // sub_block_bits
+		proportions = packed.popcount(words[0:sub_blocks * sub_words].reshape(-1, sub_words)) / float(sub_block_bits)
+		chi_blocks = 4.0 * sub_block_bits * float(((proportions - 0.5) ** 2).sum())
+
+		# Counts of the overlapping pairs 00, 01, 10 and 11, and the transitions between them, from the stream and itself delayed
+		previous = delay(words, 1)
+		serial_pairs = bits - 1
+		pairs_11 = count_from(words & previous, 1)
+		pairs_01 = count_from(words & ~previous, 1)
+		pairs_10 = count_from(trim(~words & previous, bits), 1)
+		serial = numpy.array([serial_pairs - pairs_11 - pairs_01 - pairs_10, pairs_01, pairs_10, pairs_11], dtype=numpy.int64)
+		transitions = pairs_01 + pairs_10
+
+		# Counts of each 4 bit nibble over whole bytes
+		octets = words.astype('>u8').view(numpy.uint8)[0:bits // 8]
+		nibbles = numpy.bincount(octets >> 4, minlength=16) + numpy.bincount(octets & 15, minlength=16)
+
+		agreements = {}
+		for lag in self.lags:
+			differences = count_from(trim(words ^ delay(words, lag), bits), lag)
+			agreements[lag] = [bits - lag - differences, bits - lag] if bits > lag else [0, 0]
+
+		registers = [packed.agreement(words, output, bits) for output in (outputs or [])]
+		combined = [packed.agreement(words, outputs[i] ^ outputs[j], bits) for i, j in self.pairs] if outputs else []
+
+		# Add everything to the totals
+		self.bits += bits
+		self.ones += ones
+		self.chi_blocks += chi_blocks
+		self.sub_blocks += sub_blocks
+		self.serial += serial
+		self.serial_pairs += serial_pairs
+		self.nibbles += nibbles
+		self.transitions += transitions
+		for lag in self.lags:
+			self.agreements[lag][0] += agreements[lag][0]
+			self.agreements[lag][1] += agreements[lag][1]
+		self.registers = [total + int(count) for total, count in zip(self.registers, registers)]
+		self.combined = [total + int(count) for total, count in zip(self.combined, combined)]
+
+		return self.p_values(bits, ones, chi_blocks, sub_blocks, serial, serial_pairs, nibbles, transitions, agreements, registers, combined)
+
+	# Function to return the p-value of every test over all the blocks so far
+	def overall(self):
+		return self.p_values(self.bits, self.ones, self.chi_blocks, self.sub_blocks, self.serial, self.serial_pairs, self.nibbles, self.transitions, self.agreements, self.registers, self.combined)
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Run a battery of statistical tests over the keystream, a block at a time.')
+	parser.add_argument('-k','--key', help='Comma separated initial states of the LFSRs. Default is the key in stream-cipher.py.', required=False)
+	parser.add_argument('-n','--number', help='Number of bits of keystream to test. Default is ' + str(test_bits) + '.', type=int, default=test_bits)
+	parser.add_argument('-b','--block', help='Number of bits in each block, a multiple of 16384. Default is ' + str(block_bits) + '.', type=int, default=block_bits)
+	parser.add_argument('-l','--lags', help='Comma separated lags for the autocorrelation test. Default is ' + ",".join(str(lag) for lag in default_lags) + '.', required=False)
+	parser.add_argument('-f','--file', help='Test the bytes of a keystream file instead of generating one. The LFSR correlation tests are left out.', required=False)
+	args = vars(parser.parse_args())
+
+	stream_cipher = complexity.load_cipher()
+	lags = default_lags
+	if args['lags']:
+		lags = [int(lag) for lag in args['lags'].split(',')]
+	if [lag for lag in lags if lag < 1 or lag >= args['block']]:
+		print ("Lags must be at least 1 and less than the block size")
+		sys.exit(1)
+	if args['block'] < 1 or args['block'] % (64 * stream_cipher.lanes):
+		print ("The block size must be a positive multiple of " + str(64 * stream_cipher.lanes) + " bits")
+		sys.exit(1)
+	if args['number'] < 2:
+		print ("At least 2 bits of keystream are needed")
+		sys.exit(1)
+
+	states = stream_cipher.initial_states
+	if args['key']:
+		states = [int(state) for state in args['key'].split(',')]
+	if len(states) != len(stream_cipher.registers):
+		print ("The key must give an initial state for each of the " + str(len(stream_cipher.registers)) + " LFSRs")
+		sys.exit(1)
+
+	# Each block comes as (packed keystream, output of each LFSR or None, number of bits)
+	if args['file']:
+		infile = open(args['file'], 'rb')
+		blocks = iter(lambda: infile.read(args['block'] // 8), b'')
+		blocks = ((numpy.frombuffer(data + b'\x00' * (-len(data) % 8), dtype='>u8').astype(numpy.uint64), None, 8 * len(data)) for data in blocks)
+		battery = Battery(lags)
+	else:
+		chunks = stream_cipher.register_chunks(states, args['block'] // 8)
+		blocks = ((packed.combine(stream_cipher.boolean_outputs, outputs), outputs, args['block']) for outputs in chunks)
+		battery = Battery(lags, [register['name'] for register in stream_cipher.registers])
+
+	names = battery.tests()
+	print ("Tests: " + ", ".join(str(number + 1) + " " + name for number, name in enumerate(names)))
+	print ("Block p-values, * below " + str(significance) + ":")
+	startTime = time.time()
+	block = 0
+	for words, outputs, available in blocks:
+		bits = min(available, args['number'] - battery.bits)
+		if bits < 2:
+			break
+		values = battery.update(words, bits, outputs)
+		block += 1
+		print (str(block) + ": " + " ".join(("%.4f" % value) + ("*" if value < significance else " ") for value in values))
+		if battery.bits >= args['number']:
+			break
+	taken = time.time() - startTime
+
+	if not battery.bits:
+		print ("No keystream to test")
+		sys.exit(1)
+	print ("Overall p-values for " + str(battery.bits) + " bits:")
+	for name, value in zip(names, battery.overall()):
+		print (name + ": " + ("%.6f" % value) + (" FAIL" if value < significance else " pass"))
+	print ("Time taken (seconds): " + str(taken) + " (" + str(int(battery.bits / max(taken, 1e-9))) + " bits per second)")
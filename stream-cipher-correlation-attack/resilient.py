@@ -0,0 +1,275 @@
+#!/usr/bin/env python2
+
+# Search for balanced, correlation immune combining functions with more than four inputs
+# https://github.com/TartarusLabs/Crypto-Tricks/stream-cipher-correlation-attack/
+# james.fell@alumni.york.ac.uk
+
+# combining-function.py checks every one of the 2^16 functions of four inputs in turn. With five inputs there are 2^32 of them
+# and with six 2^64, so instead the truth table of an n input function f is built from two halves of n - 1 inputs, a where x1 is
+# 0 and b where x1 is 1. The Walsh spectrum of f is then Wa + Wb over its first half and Wa - Wb over its second. Every condition
+# on f is a range of values allowed at each point of its spectrum: zero at the masks that must be balanced or correlation
+# immune, and no further from zero than 2^n - 2 x nonlinearity everywhere. Those ranges give a range for each point of Wa, and
+# once a is chosen an exact range for each point of Wb. Halves are found the same way down to four inputs, where the spectra of
+# all 65536 functions are computed once with the fast Walsh-Hadamard transform and simply filtered, so a function that breaks a
+# condition is never built.
+#
+# Permuting the inputs, complementing any of them and complementing the output change neither the balance, the order of
+# correlation immunity nor the nonlinearity of a function. A general affine change of the inputs keeps the nonlinearity but not
+# correlation immunity, so these are the only affine and permutation equivalences used. Applying them to x2 to xn can turn any
+# function into one whose first half a is the smallest in its class, so only those first halves are tried. Every class is still
+# found at least once, from a search up to 2 x (n - 1)! x 2^(n - 1) times smaller. The first halves are handed to a pool of worker
+# processes, and the progress can be checkpointed to a file so that a long search can be stopped and resumed.
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+import numpy
+import correlation
+
+# Functions with up to this many inputs are found by filtering the spectra of all of them
+base_variables = 4
+
+# Largest number of inputs supported, as truth tables are held in 64 bit words
+max_variables = 6
+
+# Seconds between saves of the checkpoint file
+checkpoint_interval = 60
+
+# Truth tables and spectra of every function of up to base_variables inputs, by number of inputs, computed when first needed
+everything = {}
+
+# Settings of the search in each worker process, set up by initialise() when the pool starts
+worker = {}
+
+
+# Function to unpack truth tables, held as integers with the first entry in the most significant bit like combining-function.py,
+# into rows of 0s and 1s
+def entries(tables, variables):
+	size = 1 << variables
+	shifts = numpy.arange(size - 1, -1, -1, dtype=numpy.uint64)
+	return ((numpy.asarray(tables, dtype=numpy.uint64)[..., None] >> shifts) & numpy.uint64(1)).astype(numpy.uint8)
+
+
+# Function to pack rows of 0s and 1s back into truth tables
+def pack(rows):
+	size = rows.shape[-1]
+	if size < 8:
+		rows = numpy.concatenate([numpy.zeros(rows.shape[:-1] + (8 - size,), dtype=numpy.uint8), rows], axis=-1)
+	octets = numpy.ascontiguousarray(numpy.packbits(rows, axis=-1))
+	return octets.view('>u' + str(octets.shape[-1])).astype(numpy.uint64)[..., 0]
+
+
+# Function to compute the Walsh spectra of rows of truth table entries. Entry w of a spectrum is the sum over x of
+# (-1)^(f(x) ^ w.x), as in combiner.walsh_spectrum().
+def spectra(rows):
+	signs = 1 - 2 * numpy.asarray(rows, dtype=numpy.int64)
+	return correlation.walsh_hadamard(signs.T).T
+
+
+# Function to return the truth tables and spectra of every function with a small number of inputs
+def all_functions(variables):
+	if variables not in everything:
+		tables = numpy.arange(0, 1 << (1 << variables), dtype=numpy.uint64)
+		everything[variables] = (tables, spectra(entries(tables, variables)))
+	return everything[variables]
+
+
+# Function to work out the range allowed at every point of the spectrum of a function: zero at every mask of order inputs or
+# fewer, so that it is balanced and correlation immune of that order, and no more than 2^n - 2 x nonlinearity from zero elsewhere
+def constraints(variables, order, nonlinearity):
+	size = 1 << variables
+	bound = size - 2 * nonlinearity
+	weights = numpy.array([bin(mask).count("1") for mask in range(0, size)])
+	return numpy.where(weights <= order, 0, -bound), numpy.where(weights <= order, 0, bound)
+
+
+# Generator yielding every function of some number of inputs whose spectrum lies between low and high at every point, in
+# ascending order of truth table, as batches of (truth tables, spectra)
+def search(variables, low, high):
+	if variables <= base_variables:
+		tables, spectrum = all_functions(variables)
+		keep = numpy.all((spectrum >= low) & (spectrum <= high), axis=1)
+		if keep.any():
+			yield tables[keep], spectrum[keep]
+		return
+
+	# Wa is the mean of the first and second halves of the spectrum of f
+	half = 1 << (variables - 1)
+	a_low = numpy.maximum(-half, -((-low[0:half] - low[half:]) // 2))
+	a_high = numpy.minimum(half, (high[0:half] + high[half:]) // 2)
+	if numpy.any(a_low > a_high):
+		return
+	for a_tables, a_spectra in search(variables - 1, a_low, a_high):
+		for table, spectrum in zip(a_tables, a_spectra):
+			for batch in complete(variables, table, spectrum, low, high):
+				yield batch
+
+
+# Generator yielding, as batches of (truth tables, spectra), every function of some number of inputs with the first half a
+# whose spectrum lies between low and high
+def complete(variables, table, spectrum, low, high):
+	half = 1 << (variables - 1)
+	b_low = numpy.maximum(low[0:half] - spectrum, spectrum - high[half:])
+	b_high = numpy.minimum(high[0:half] - spectrum, spectrum - low[half:])
+	if numpy.any(b_low > b_high):
+		return
+	for b_tables, b_spectra in search(variables - 1, b_low, b_high):
+		yield (numpy.uint64(table) << numpy.uint64(half)) | b_tables, numpy.hstack([spectrum + b_spectra, spectrum - b_spectra])
+
+
+# Function to list, for every permutation of the inputs and every pattern of complemented inputs, where each truth table entry
+# is taken from
+def transformations(variables):
+	size = 1 << variables
+	maps = []
+	for order in itertools.permutations(range(0, variables)):
+		moved = [sum(((x >> i) & 1) << order[i] for i in range(0, variables)) for x in range(0, size)]
+		for flips in range(0, size):
+			maps.append([moved[x] ^ flips for x in range(0, size)])
+	return numpy.array(maps)
+
+
+# Function to find the smallest truth table equivalent to a function under the transformations, with or without its output
+# complemented
+def canonical(table, variables, maps):
+	moved = pack(entries(table, variables)[maps])
+	return int(min(moved.min(), (moved ^ numpy.uint64((1 << (1 << variables)) - 1)).min()))
+
+
+# Function to work out the nonlinearity of a function from its spectrum, 1/2 (2^n - max_{w}|F(w)|)
+def nonlinearity(spectrum):
+	return 0.5 * (len(spectrum) - numpy.abs(spectrum).max())
+
+
+# Function to work out the order of correlation immunity of a function from its spectrum, the largest m for which every mask of
+# 1 to m inputs is zero
+def immunity(spectrum):
+	variables = len(spectrum).bit_length() - 1
+	for order in range(1, variables + 1):
+		if any(spectrum[mask] for mask in range(1, len(spectrum)) if bin(mask).count("1") == order):
+			return order - 1
+	return variables
+
+
+# Function to turn batches of (truth tables, spectra) into a list of (truth table, nonlinearity, order of correlation immunity)
+def results(batches):
+	return [(int(table), nonlinearity(spectrum), immunity(spectrum)) for tables, spectra in batches for table, spectrum in zip(tables, spectra)]
+
+
+# Generator yielding the first halves worth trying for functions of more than base_variables inputs, as (truth table, spectrum)
+def first_halves(variables, low, high, classes):
+	half = 1 << (variables - 1)
+	maps = transformations(variables - 1) if classes else None
+	a_low = numpy.maximum(-half, -((-low[0:half] - low[half:]) // 2))
+	a_high = numpy.minimum(half, (high[0:half] + high[half:]) // 2)
+	for a_tables, a_spectra in search(variables - 1, a_low, a_high):
+		for table, spectrum in zip(a_tables, a_spectra):
+			if classes and canonical(table, variables - 1, maps) != int(table):
+				continue
+			yield int(table), spectrum
+
+
+# Function run in each worker process when the pool starts
+def initialise(variables, low, high):
+	worker['variables'] = variables
+	worker['low'] = low
+	worker['high'] = high
+
+
+# Function run in a worker to find every function with a given first half
+def run_half(task):
+	table, spectrum = task
+	return results(complete(worker['variables'], table, spectrum, worker['low'], worker['high']))
+
+
+# Function to save the progress of a search to a checkpoint file, under a temporary name first so that an interrupted save never
+# leaves a partial file
+def save(filename, progress):
+	with open(filename + ".tmp", 'w') as outfile:
+		json.dump(progress, outfile)
+	os.rename(filename + ".tmp", filename)
+
+
+# Function to search for functions of some number of inputs that are balanced, correlation immune of order and have at least the
+# given nonlinearity. With classes set only functions whose first half is the smallest in its class are returned. The search is
+# resumed from and saved to the checkpoint file if one is given, and stops early once at least limit functions have been found.
+# Returns a list of (truth table, nonlinearity, order of correlation immunity) in ascending order of truth table.
+def find(variables, order, target, classes=True, workers=None, checkpoint=None, limit=None, verbose=False):
+	if variables < 1 or variables > max_variables:
+		raise ValueError("Number of inputs must be between 1 and " + str(max_variables))
+	if order < 0 or order >= variables:
+		raise ValueError("Order of correlation immunity must be between 0 and " + str(variables - 1))
+	if target < 0 or target > 1 << (variables - 1):
+		raise ValueError("Nonlinearity must be between 0 and " + str(1 << (variables - 1)))
+	low, high = constraints(variables, order, target)
+
+	if variables <= base_variables:
+		found = results(search(variables, low, high))
+		if classes:
+			maps = transformations(variables)
+			found = [result for result in found if canonical(result[0], variables, maps) == result[0]]
+		return found[0:limit] if limit else found
+
+	settings = {'variables': variables, 'order': order, 'nonlinearity': target, 'classes': classes}
+	progress = dict(settings, completed=0, found=[])
+	if checkpoint and os.path.exists(checkpoint):
+		with open(checkpoint, 'r') as infile:
+			saved = json.load(infile)
+		if dict((key, saved.get(key)) for key in settings) != settings:
+			raise ValueError("Checkpoint " + checkpoint + " is from a search with different settings")
+		progress = saved
+		if verbose:
+			print ("Resuming after " + str(progress['completed']) + " first halves with " + str(len(progress['found'])) + " functions found")
+
+	pool = multiprocessing.Pool(workers, initialise, (variables, low, high))
+	lastSave = time.time()
+	try:
+		halves = itertools.islice(first_halves(variables, low, high, classes), progress['completed'], None)
+		for found in pool.imap(run_half, halves):
+			progress['completed'] += 1
+			progress['found'].extend(found)
+			if checkpoint and time.time() - lastSave > checkpoint_interval:
+				save(checkpoint, progress)
+				lastSave = time.time()
+			if limit and len(progress['found']) >= limit:
+				break
+	finally:
+		pool.terminate()
+		pool.join()
+	if checkpoint:
+		save(checkpoint, progress)
+	if verbose:
+		print ("Tried " + str(progress['completed']) + " first halves")
+	return [tuple(result) for result in progress['found']]
+
+
+# Main entry point. Examine the command line arguments and act on them.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Search for balanced, correlation immune combining functions with up to ' + str(max_variables) + ' inputs.')
+	parser.add_argument('-n','--inputs', help='Number of inputs to the combining function. Default is 5.', type=int, default=5)
+	parser.add_argument('-m','--order', help='Order of correlation immunity required. Default is 1.', type=int, default=1)
+	parser.add_argument('-l','--nonlinearity', help='Smallest nonlinearity wanted. Default is 0.', type=int, default=0)
+	parser.add_argument('-a','--all', help='List every function rather than one for each class of equivalent functions.', action='store_true')
+	parser.add_argument('-w','--workers', help='Number of worker processes. Default is one per core.', type=int, required=False)
+	parser.add_argument('-c','--checkpoint', help='File to save progress to and resume from', required=False)
+	parser.add_argument('-x','--limit', help='Stop once at least this many functions have been found', type=int, required=False)
+	args = vars(parser.parse_args())
+
+	print ("Searching for balanced, order " + str(args['order']) + " correlation immune combining functions of " + str(args['inputs']) + " inputs with non-linearity of at least " + str(args['nonlinearity']) + ".")
+	startTime = time.time()
+	try:
+		found = find(args['inputs'], args['order'], args['nonlinearity'], not args['all'], args['workers'], args['checkpoint'], args['limit'], verbose=True)
+	except ValueError as e:
+		print (str(e))
+		sys.exit(1)
+
+	# Print them in the same form as combining-function.py
+	for number, (table, non_linearity, immune) in enumerate(found):
+		print (str(number + 1) + " - " + bin(table)[2:].zfill(1 << args['inputs']) + " - Non-linearity: " + str(non_linearity))
+		if args['order'] < 2 <= immune:
+			print ("The above function is also correlation immune order 2")
+	print ("Found " + str(len(found)) + " functions in " + str(time.time() - startTime) + " seconds")
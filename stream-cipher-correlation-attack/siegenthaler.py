@@ -5,44 +5,27 @@
 # james.fell@alumni.york.ac.uk
 
 
+import os
+import sys
+import argparse
+import numpy
 from bitstring import BitArray
+import lfsr
+import correlation
+import packed
+import msequence
+import combiner
 
 # Set how many bits of keystream to generate
 keybits = 2000
 
-# Define the boolean function as simply an array of results which can be used for lookups
-boolean_outputs = [1,1,0,1,0,1,1,0,1,0,0,0,1,1,0,0]
+# Read the sizes and tap sequences of the LFSRs and the combining function from the description of the cipher
+description = combiner.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stream-cipher.json'))
+taps = [lfsr_description['taps'] for lfsr_description in description['registers']]
+lengths = [lfsr_description['length'] for lfsr_description in description['registers']]
 
-
-# Function to create a requested LFSR and clock it a requested number of times, returning the resulting bit stream in a BitArray
-def register(tap_sequence, initial_bits, clock_cycles):
-
-        # Initialise the LFSR
-        lfsr = initial_bits
-
-        # Initialise output_bits to be a BitArray of zeroes with length equal to the number of clock cycles requested
-        output_bits = '0' * clock_cycles
-        output_bits = BitArray(bin=output_bits)
-
-        # Clock the LFSR the requested number of times
-        for cycle in range(0, clock_cycles):
-
-                # tapped is the result of XORing together all the bits specified by the tap sequence
-                tapped = 0
-                for tap in tap_sequence:
-                        tapped = tapped ^ lfsr[tap-1]
-
-                # Add the rightmost bit of the LFSR to the output
-                output_bits[cycle] = lfsr[initial_bits.len-1]
-
-                # Shift the LFSR right one bit, discarding the already saved rightmost bit
-                lfsr >>= 1
-
-                # Overwrite the leftmost bit of the LFSR with the result of the earlier tap operation
-                lfsr[0] = tapped
-
-        # Return the BitArray of all the output bits we saved from the LFSR
-        return output_bits
+# The boolean function is simply an array of results which can be used for lookups
+boolean_outputs = description['combining_function']
 
 
 # Function to implement the boolean function from our stream cipher specification
@@ -53,146 +36,153 @@ def boolean_function(bit1, bit2, bit3, bit4):
 
 
 
-# Calculate a Linear Approximation Table for the boolean function
+# Function to calculate a Linear Approximation Table for the boolean function
 # This essentially gives us the same information as the Walsh-Hadamard spectrum although it is done with statistics instead of vectors
+def approximation_table(boolean_outputs):
+
+	counter = [-8] * 16
+
+	# For all 16 possible input masks, ie for all 16 possible ways of combining input bits
+	for s_in_bits in range(0,16):
+
+		# For all 16 possible 4 bit inputs to the combining function
+		for s_in in range(0,16):
 
-counter = [-8] * 16
+			# Do boolean function lookup on s_in and assign to s_out
+			s_out = boolean_outputs[s_in]
 
-# For all 16 possible input masks, ie for all 16 possible ways of combining input bits
-for s_in_bits in range(0,16):
+			# XOR together the bits of s_in marked by the input mask
+			s_in_bitarray = BitArray('uint:4='+str(s_in & s_in_bits))
+			xor_in = s_in_bitarray[0] ^ s_in_bitarray[1] ^ s_in_bitarray[2] ^ s_in_bitarray[3]
 
-	# For all 16 possible 4 bit inputs to the combining function
-	for s_in in range(0,16):
+			# If the output and the XORed inputs are the same value, increment counter[s_in_bits]
+			if xor_in == s_out:
+				counter[s_in_bits] += 1
 
-		# Do boolean function lookup on s_in and assign to s_out
-                s_out = boolean_outputs[s_in]
+	return counter
 
-                # XOR together the bits of s_in marked by the input mask
-                s_in_bitarray = BitArray('uint:4='+str(s_in & s_in_bits))
-                xor_in = s_in_bitarray[0] ^ s_in_bitarray[1] ^ s_in_bitarray[2] ^ s_in_bitarray[3]
 
-                # If the output and the XORed inputs are the same value, increment counter[s_in_bits]
-                if xor_in == s_out:
-                	counter[s_in_bits] += 1
+# Function to count how many of the first keybits bits of two bit streams agree, packing them into 64 bit words and counting
+# the bits set in their XOR rather than comparing them a bit at a time
+def agreement(stream_a, stream_b, keybits):
+	return int(packed.agreement(packed.pack(stream_a, keybits), packed.pack(stream_b, keybits), keybits))
 
-	# Print the table out so we can plan our divide and conquer attack
-	print "Input Mask = " + str(s_in_bits) + " Bias = " +str(counter[s_in_bits])
 
+# Function to find the initial state of a register whose output agrees with the keystream a fraction target of the time.
+# By default every initial state is scored at once with a Walsh-Hadamard scan and the one furthest from half agreement is
+# taken. With sequential set, each nonzero initial state is instead tested a word at a time with the sequential probability
+# ratio test in correlation.py and the accepted state with the highest likelihood ratio is taken. Returns (state, agreement).
+def attack_register(tap_sequence, length, keystream, target, sequential=False, false_reject=0.001):
+	if not sequential:
+		agreements = correlation.scan(tap_sequence, length, keystream, keybits)
+		return correlation.ranked(agreements, keybits, 1)[0]
 
-# Read the target key stream from the text file
-print "\nReading in target keystream from stream.txt"
-samples = open('stream.txt', 'r')
-sampleKeyStream = BitArray('bin='+samples.read())
-samples.close()
+	candidates = lfsr.engine(tap_sequence, length).output(numpy.arange(1, 1 << length), keybits)
+	agreements, examined, decisions = correlation.sequential(candidates, packed.pack(keystream, keybits), keybits, target, false_reject)
+	print "Average bits examined per initial state: " + str(examined.mean()) + " out of " + str(keybits)
 
+	# Fall back on the undecided states if none was accepted
+	survivors = numpy.nonzero(decisions == 1)[0]
+	if not len(survivors):
+		survivors = numpy.nonzero(decisions == 0)[0]
+	if not len(survivors):
+		print "Every initial state was rejected"
+		sys.exit(1)
+	best = survivors[numpy.argmax(correlation.log_likelihood(agreements[survivors], examined[survivors], target))]
+	return int(best) + 1, int(agreements[best])
 
-# Generate 2000 bits of output from LFSR1 for all 128 possible initial states and check for correlation with the keystream
-# All incorrect initial states should give about 4/8 agreement whereas correct one should give about 3/8
 
-print "\nAttacking LFSR1 using first order correlation"
+# Main entry point. Run the four phases of the attack against stream.txt.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Recover the initial states of the four LFSRs from the keystream in stream.txt.')
+	parser.add_argument('-s','--sequential', help='Test the initial states of LFSR1, LFSR3 and LFSR4 with a sequential probability ratio test, stopping early on each one, instead of the Walsh-Hadamard scan.', action='store_true')
+	parser.add_argument('-r','--reject', help='Probability of the sequential test wrongly rejecting the correct initial state. Default is 0.001.', type=float, default=0.001)
+	args = vars(parser.parse_args())
 
-for key in range (0, 128):
-	counter = 0
-	lfsr1 = register([4,7], BitArray('uint:7='+str(key)), keybits)
+	if args['reject'] <= 0 or args['reject'] >= 1:
+		print "The false reject probability must be between 0 and 1"
+		sys.exit(1)
 
-	for cycle in range(0, keybits):
-		if sampleKeyStream[cycle] == lfsr1[cycle]:
-			counter += 1
+	# Print the Linear Approximation Table out so we can plan our divide and conquer attack
+	biases = approximation_table(boolean_outputs)
+	for s_in_bits in range(0,16):
+		print "Input Mask = " + str(s_in_bits) + " Bias = " +str(biases[s_in_bits])
 
-	# As soon as we find an initial state that gives a correlation of less than 800 out of 2000 we stop
-	if counter < 800:
-		print "LFSR1 - Initial State: " + str(key) + " Counter: " + str(counter)
-		break
 
-# This found that the correct initial state for LFSR1 is 27
+	# Read the target key stream from the text file
+	print "\nReading in target keystream from stream.txt"
+	samples = open('stream.txt', 'r')
+	sampleKeyStream = BitArray('bin='+samples.read())
+	samples.close()
 
 
-# Generate 2000 bits of output from LFSR3 for all 8192 possible initial states and check for correlation with the keystream
-# All incorrect initial states should give about 4/8 agreement whereas correct one should give about 2/8
+	# Score 2000 bits of output from LFSR1 for all 128 possible initial states against the keystream in one Walsh-Hadamard pass,
+	# or one at a time with early abort if -s was given
+	# All incorrect initial states should give about 4/8 agreement whereas correct one should give about 3/8
 
-print "\nAttacking LFSR3 using first order correlation"
+	print "\nAttacking LFSR1 using first order correlation"
 
-for key in range (0, 8192):
-        counter = 0
-        lfsr3 = register([8,11,12,13], BitArray('uint:13='+str(key)), keybits)
+	# Rank the initial states by how far their agreement is from 1000 out of 2000 and take the best
+	key, counter = attack_register(taps[0], lengths[0], sampleKeyStream, 0.5 + biases[8] / 16.0, args['sequential'], args['reject'])
 
-        for cycle in range(0, keybits):
-                if sampleKeyStream[cycle] == lfsr3[cycle]:
-                        counter += 1
+	# Check the best initial state directly against the keystream, taking its output as a window of the m-sequence of LFSR1
+	counter = agreement(sampleKeyStream, msequence.index(taps[0], lengths[0]).bits(key, keybits), keybits)
+	print "LFSR1 - Initial State: " + str(key) + " Counter: " + str(counter)
 
-	# As soon as we find an initial state that gives a correlation of less than 600 out of 2000 we stop
-        if counter < 600:
-                print "LFSR3 - Key: " + str(key) + " Counter: " + str(counter)
-		break
+	# This found that the correct initial state for LFSR1 is 27
 
-# This found that the correct initial state for LFSR3 is 991
 
+	# Score 2000 bits of output from LFSR3 for all 8192 possible initial states against the keystream in one Walsh-Hadamard pass
+	# All incorrect initial states should give about 4/8 agreement whereas correct one should give about 2/8
 
-# Generate 2000 bits of output from LFSR4 for all 32768 possible initial states, XOR it with the output of LFSR1 and check for correlation with the keystream
-# All incorrect initial states should give about 4/8 agreement whereas correct one should give about 5/8
+	print "\nAttacking LFSR3 using first order correlation"
 
-print "\nAttacking LFSR4 using second order correlation with LFSR1"
+	key, counter = attack_register(taps[2], lengths[2], sampleKeyStream, 0.5 + biases[2] / 16.0, args['sequential'], args['reject'])
+	counter = agreement(sampleKeyStream, msequence.index(taps[2], lengths[2]).bits(key, keybits), keybits)
+	print "LFSR3 - Key: " + str(key) + " Counter: " + str(counter)
 
-# Set up LFSR1 using already recovered initial state
-lfsr1 = register([4,7], BitArray(bin='0011011'), keybits)    	# Correct initial state is 27
+	# This found that the correct initial state for LFSR3 is 991
 
-# For each possible initial value of LFSR4
-for key in range (0, 32768):
-	
-	# Generate 2000 bits from LFSR4
-	lfsr4 = register([14,15], BitArray('uint:15='+str(key)), keybits)
 
-	# XOR together the 2000 bits from LFSR1 with the 2000 bits from LFSR4
-	lfsr1_xor_lfsr4 = lfsr1 ^ lfsr4
-	
-	# Compare the resulting bitstream with the keystream we are attacking
-	counter = 0
-	for cycle in range(0, keybits):
-		if sampleKeyStream.bin[cycle] == lfsr1_xor_lfsr4.bin[cycle]:
-			counter += 1
+	# Score 2000 bits of output from LFSR4 XORed with the output of LFSR1 for all 32768 possible initial states of LFSR4 against the keystream
+	# All incorrect initial states should give about 4/8 agreement whereas correct one should give about 5/8
 
-	# If more than 1200 of the 2000 bits agree we have found the correct initial value of LFSR4
-	if counter > 1200:
-		print "LFSR4 - Key: " + str(key) + " Counter: " + str(counter)
-		break
+	print "\nAttacking LFSR4 using second order correlation with LFSR1"
 
-# This found that the correct initial state for LFSR4 is 3254
+	# Set up LFSR1 using already recovered initial state
+	lfsr1 = lfsr.register(taps[0], BitArray(bin='0011011'), keybits)    	# Correct initial state is 27
 
+	# LFSR1 XOR LFSR4 agrees with the keystream exactly where LFSR4 agrees with the keystream XOR LFSR1, so scan LFSR4 against that
+	key, counter = attack_register(taps[3], lengths[3], sampleKeyStream ^ lfsr1, 0.5 + biases[9] / 16.0, args['sequential'], args['reject'])
+	counter = agreement(sampleKeyStream, lfsr1 ^ msequence.index(taps[3], lengths[3]).bits(key, keybits), keybits)
+	print "LFSR4 - Key: " + str(key) + " Counter: " + str(counter)
 
-# Generate 2000 bits of output from LFSR2 for all 2048 possible initial states and see if the resulting keystream is identical to that under attack
-# All incorrect initial states should give about 50% agreement whereas correct one should give 100%
+	# This found that the correct initial state for LFSR4 is 3254
 
-print "\nAttacking LFSR2 using brute force"
 
-# Set up LFSRs 1, 3 and 4 using recovered initial states
-lfsr1 = register([4,7], BitArray('uint:7=27'), keybits)
-lfsr3 = register([8,11,12,13], BitArray('uint:13=991'), keybits)
-lfsr4 = register([14,15], BitArray('uint:15=3254'), keybits)
+	# Generate 2000 bits of output from LFSR2 for all 2048 possible initial states and see if the resulting keystream is identical to that under attack
+	# All incorrect initial states should give about 50% agreement whereas correct one should give 100%
 
-# Set up BitArray to hold the generated keystream
-stream_key = '0' * keybits
-stream_key = BitArray(bin=stream_key)
+	print "\nAttacking LFSR2 using brute force"
 
-# For each possible initial value of LFSR2
-for key in range (0, 2048):
+	# Set up LFSRs 1, 3 and 4 using recovered initial states
+	lfsr1 = lfsr.register(taps[0], BitArray(uint=27, length=lengths[0]), keybits)
+	lfsr3 = lfsr.register(taps[2], BitArray(uint=991, length=lengths[2]), keybits)
+	lfsr4 = lfsr.register(taps[3], BitArray(uint=3254, length=lengths[3]), keybits)
 
-        # Generate 2000 bits from LFSR2
-        lfsr2 = register([3,8,9,11], BitArray('uint:11='+str(key)), keybits)
-       
-        # Compare the resulting keystream with the keystream we are attacking
-        counter = 0
-        for cycle in range(0, keybits):
+	# Generate 2000 bits from LFSR2 for every possible initial value at once, packed into 64 bit words with one row per initial value
+	lfsr2 = lfsr.engine(taps[1], lengths[1]).output(numpy.arange(0, 2048), keybits)
 
-        	# Generate 1 bit of keystream based on the current guess for the initial state of LFSR2
-        	stream_key[cycle] = boolean_function(lfsr1.bin[cycle], lfsr2.bin[cycle], lfsr3.bin[cycle], lfsr4.bin[cycle])
+	# Generate the keystream for every guess at the initial state of LFSR2 by applying the boolean function a word at a time
+	stream_keys = packed.combine(boolean_outputs, [packed.pack(lfsr1, keybits), lfsr2, packed.pack(lfsr3, keybits), packed.pack(lfsr4, keybits)])
 
-		# Compare it to the corresponding bit of the keystream under attack, increment a counter whenever they match
-                if sampleKeyStream.bin[cycle] == stream_key.bin[cycle]:
-                        counter += 1
+	# Compare them all to the keystream under attack, counting how many bits match for each guess
+	counters = packed.agreement(stream_keys, packed.pack(sampleKeyStream, keybits), keybits)
 
-        # If all of the 2000 bits agree we have found the correct initial value of LFSR2
-        if counter == 2000:
-                print "LFSR2 - Key: " + str(key) + " Counter: " + str(counter) 
-                break
+	# If all of the 2000 bits agree we have found the correct initial value of LFSR2
+	for key in range (0, 2048):
+		if counters[key] == 2000:
+			print "LFSR2 - Key: " + str(key) + " Counter: " + str(counters[key])
+			break
 
-# This found that the correct initial state for LFSR2 is 474
+	# This found that the correct initial state for LFSR2 is 474
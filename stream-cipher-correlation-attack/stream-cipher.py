@@ -5,16 +5,38 @@
 # james.fell@alumni.york.ac.uk
 
 
+import os
+import sys
+import time
+import argparse
+import numpy
 from bitstring import BitArray
+import lfsr
+import packed
+import combiner
 
 # Set how many bits of keystream we would like to generate when the script is executed
 keybits = 2000
 
-# Define the boolean function as simply an array of results which can be used for lookups
-boolean_outputs = [1,1,0,1,0,1,1,0,1,0,0,0,1,1,0,0]
+# Number of bytes of keystream generated at a time by keystream_chunks(), and read and written at a time when encrypting a file
+chunk_bytes = 1 << 20
 
+# Number of stretches of each chunk that every LFSR is clocked through side by side
+lanes = 256
 
-# Function to create a specific LFSR and clock it a specific number of times, storing the resulting bit stream in a BitArray
+# Read the sizes and tap sequences of the LFSRs and the combining function from the description of the cipher
+description = combiner.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stream-cipher.json'))
+registers = description['registers']
+
+# The boolean function is simply an array of results which can be used for lookups
+boolean_outputs = description['combining_function']
+
+# The initial states of the four LFSRs, which together make up the key
+initial_states = [27, 474, 991, 3254]
+
+
+# Function to create a specific LFSR and clock it a specific number of times, storing the resulting bit stream in a BitArray.
+# This is the reference version that clocks one bit at a time. lfsr.py gives the same output a 64 bit word at a time.
 def register(tap_sequence, initial_bits, clock_cycles):
 
 	# Initialise the LFSR
@@ -29,8 +51,8 @@ def register(tap_sequence, initial_bits, clock_cycles):
 
 		# tapped is the result of XORing together all the bits specified by the tap sequence
 		tapped = 0
-        	for tap in tap_sequence:
-   			tapped = tapped ^ lfsr[tap-1]
+		for tap in tap_sequence:
+			tapped = tapped ^ lfsr[tap-1]
 
 		# Add the rightmost bit of the LFSR to the output
 		output_bits[cycle] = lfsr[initial_bits.len-1]
@@ -52,20 +74,98 @@ def boolean_function(bit1, bit2, bit3, bit4):
 	return boolean_outputs[input_num.uint]
 
 
-# Clock each of the 4 LFSRs keybits times
-lfsr1 = register([4,7], BitArray('uint:7=27'), keybits)
-lfsr2 = register([3,8,9,11], BitArray('uint:11=474'), keybits)
-lfsr3 = register([8,11,12,13], BitArray('uint:13=991'), keybits)
-lfsr4 = register([14,15], BitArray('uint:15=3254'), keybits)
-
-
-# Apply the boolean function to the saved LFSR outputs
-stream_key = '0' * keybits
-stream_key = BitArray(bin=stream_key)
-
-for cycle in range(0, keybits):
-	stream_key[cycle] = boolean_function(lfsr1.bin[cycle], lfsr2.bin[cycle], lfsr3.bin[cycle], lfsr4.bin[cycle])
-
-# Print out the keybits generated by the combining function
-print "Keybits: " + stream_key.bin
-
+# Generator yielding the output of every LFSR from the given initial states forever, chunk_size bytes at a time, which must be a
+# multiple of 8 x lanes. Each chunk is split into lanes stretches of whole words, and every LFSR is clocked through all of its
+# stretches side by side, starting from states that are jumped ahead to the start of each stretch. Yields a list with an array of
+# packed words for each LFSR, so nothing is held but the current chunk.
+def register_chunks(states, chunk_size=chunk_bytes):
+	if chunk_size < 1 or chunk_size % (8 * lanes):
+		raise ValueError("Chunk size must be a positive multiple of " + str(8 * lanes) + " bytes")
+	count = chunk_size // (8 * lanes)
+	engines = [lfsr.engine(register['taps'], register['length']) for register in registers]
+
+	# The state at the start of every stretch of the first chunk
+	lane_states = []
+	for engine, state in zip(engines, states):
+		starts = [state]
+		for lane in range(1, lanes):
+			starts.append(engine.jump(starts[-1], count * lfsr.word_bits))
+		lane_states.append(numpy.array(starts, dtype=numpy.uint64))
+
+	while True:
+		outputs = []
+		for i, engine in enumerate(engines):
+			words, ends = engine.words(lane_states[i], count)
+			outputs.append(words.ravel())
+
+			# Each stretch ends where the next one began, so jump on past the other stretches to the same stretch of the next chunk
+			lane_states[i] = engine.leap(ends, (lanes - 1) * count * lfsr.word_bits)
+		yield outputs
+
+
+# Generator yielding the keystream from the given initial states forever, chunk_size bytes at a time. The outputs of the LFSRs are
+# combined a word at a time with the truth table in packed.combine().
+def keystream_chunks(states, chunk_size=chunk_bytes):
+	for outputs in register_chunks(states, chunk_size):
+		yield packed.combine(boolean_outputs, outputs).astype('>u8').tobytes()
+
+
+# Function to return the first bits of keystream from the given initial states as a BitArray
+def keystream(states, bits):
+	chunk_size = 8 * lanes * max(1, (bits + 64 * lanes - 1) // (64 * lanes))
+	return BitArray(bytes=next(keystream_chunks(states, chunk_size)), length=bits)
+
+
+# Function to encrypt or decrypt a file, which are the same operation, by XORing it with the keystream a chunk at a time.
+# Returns the number of bytes processed.
+def crypt(infile, outfile, states, chunk_size=chunk_bytes):
+	processed = 0
+	chunks = keystream_chunks(states, chunk_size)
+	while True:
+		data = infile.read(chunk_size)
+		if not data:
+			break
+		key = numpy.frombuffer(next(chunks), dtype=numpy.uint8)[0:len(data)]
+		outfile.write((numpy.frombuffer(data, dtype=numpy.uint8) ^ key).tobytes())
+		processed += len(data)
+	return processed
+
+
+# Main entry point. Generate keybits bits of keystream, or encrypt or decrypt a file with the keystream.
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Generate keystream from the stream cipher, or encrypt or decrypt a file with it.')
+	parser.add_argument('-k','--key', help='Comma separated initial states of the LFSRs. Default is ' + ",".join(str(state) for state in initial_states) + '.', required=False)
+	parser.add_argument('-n','--number', help='Number of bits of keystream to print. Default is ' + str(keybits) + '.', type=int, default=keybits)
+	parser.add_argument('-i','--input', help='File to encrypt or decrypt', required=False)
+	parser.add_argument('-o','--output', help='File to write the result of encrypting or decrypting to', required=False)
+	parser.add_argument('-c','--chunk', help='Bytes of keystream generated at a time. Default is ' + str(chunk_bytes) + '.', type=int, default=chunk_bytes)
+	args = vars(parser.parse_args())
+
+	states = initial_states
+	if args['key']:
+		states = [int(state) for state in args['key'].split(',')]
+	if len(states) != len(registers):
+		print "The key must give an initial state for each of the " + str(len(registers)) + " LFSRs"
+		sys.exit(1)
+	for register, state in zip(registers, states):
+		if state < 1 or state >= 1 << register['length']:
+			print "The initial state of " + register['name'] + " must be between 1 and " + str((1 << register['length']) - 1)
+			sys.exit(1)
+	if args['chunk'] < 1 or args['chunk'] % (8 * lanes):
+		print "Chunk size must be a positive multiple of " + str(8 * lanes) + " bytes"
+		sys.exit(1)
+	if bool(args['input']) != bool(args['output']):
+		print "Give both an input and an output file to encrypt or decrypt"
+		sys.exit(1)
+
+	if not args['input']:
+		# Print out the keybits generated by the combining function
+		print "Keybits: " + keystream(states, args['number']).bin
+		sys.exit(0)
+
+	startTime = time.time()
+	with open(args['input'], 'rb') as infile:
+		with open(args['output'], 'wb') as outfile:
+			processed = crypt(infile, outfile, states, args['chunk'])
+	taken = time.time() - startTime
+	print "Processed " + str(processed) + " bytes in " + str(taken) + " seconds (" + str(processed / 1048576.0 / max(taken, 1e-9)) + " MB/s)"